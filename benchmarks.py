@@ -0,0 +1,286 @@
+# coding: utf-8
+
+"""
+Headless benchmarks for the sprites, the input softwares and the menus.
+-----------------------------------------------------------------------
+Usage:
+> python benchmarks.py                                  # run and print every benchmark
+> python benchmarks.py --output results.json            # also save the results
+> python benchmarks.py --baseline baseline.json         # compare with the committed results
+> python benchmarks.py --filter keyboard --number 500   # run some benchmarks only
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import pygame.locals as pg
+
+from tools import nodes, softwares, sprites
+
+from models import menus
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, number: int = 1000) -> Callable:
+    """Register a benchmark: a function returning the function to time, called number times."""
+
+    def decorator(setup: Callable) -> Callable:
+        """Add the setup function to the benchmarks."""
+        BENCHMARKS.append((name, number, setup))
+        return setup
+
+    return decorator
+
+
+def percentile(timings: List[float], value: float) -> float:
+    """Return the value percentile of sorted timings."""
+    index = min(len(timings) - 1, int(round(value / 100 * (len(timings) - 1))))
+    return timings[index]
+
+
+def measure(function: Callable, number: int) -> Dict[str, float]:
+    """Time number calls of function after a warm up call, return the operations per second and the timings."""
+    function()
+    timings = []
+    perf_counter = time.perf_counter
+    for _ in range(number):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    total = sum(timings)
+    timings.sort()
+    return {'number': number,
+            'ops': number / total if total > 0 else float('inf'),
+            'p50': percentile(timings, 50) * 1e6,
+            'p99': percentile(timings, 99) * 1e6}
+
+
+def key_events(count: int) -> List[pygame.event.EventType]:
+    """Return count synthetic keyboard events, pressing and releasing letters."""
+    events = []
+    for i in range(count // 2):
+        key = pg.K_a + i % 26
+        events.append(pygame.event.Event(pg.KEYDOWN, key=key, mod=0, unicode=chr(key), scancode=0))
+        events.append(pygame.event.Event(pg.KEYUP, key=key, mod=0, unicode=chr(key), scancode=0))
+    return events
+
+
+def mouse_events(count: int) -> List[pygame.event.EventType]:
+    """Return count synthetic mouse events, mostly motions."""
+    events = []
+    for i in range(count):
+        if i % 10 == 0:
+            events.append(pygame.event.Event(pg.MOUSEBUTTONDOWN, button=1, pos=(i % 800, i % 600)))
+        elif i % 10 == 5:
+            events.append(pygame.event.Event(pg.MOUSEBUTTONUP, button=1, pos=(i % 800, i % 600)))
+        else:
+            events.append(pygame.event.Event(pg.MOUSEMOTION, pos=(i % 800, i % 600), rel=(1, 1), buttons=(0, 0, 0)))
+    return events
+
+
+class Menu(menus.Menu):
+    """Menu whose actions do nothing, to keep the benchmarks quiet."""
+
+    def apply(self) -> None:
+        """Do nothing. Overriding method."""
+        pass
+
+
+@benchmark('text.create')
+def text_create() -> Callable:
+    """Create texts with changing messages."""
+    counter = iter(range(10 ** 9))
+    return lambda: sprites.Text(message="TEXT {}".format(next(counter) % 100))
+
+
+@benchmark('text.render')
+def text_render() -> Callable:
+    """Render a text again after changing its color."""
+    text = sprites.Text()
+    colors = iter([(0, 0, 0), (255, 0, 0)] * 10 ** 6)
+
+    def run() -> None:
+        text.message_color = next(colors)
+        text.refresh()
+
+    return run
+
+
+@benchmark('text.configure')
+def text_configure() -> Callable:
+    """Change several properties of a text, then render it once."""
+    text = sprites.Text()
+    themes = iter([{'message': "THEME {}".format(i % 7), 'message_color': (i % 255, 0, 0), 'font_size': 40 + i % 3,
+                    'background_color': (0, 0, i % 255)} for i in range(10 ** 5)])
+
+    def run() -> None:
+        text.configure(**next(themes))
+        text.refresh()
+
+    return run
+
+
+@benchmark('surface.resize')
+def surface_resize() -> Callable:
+    """Resize a surface back and forth, then render it."""
+    surface = sprites.Surface(size=(200, 40))
+    sizes = iter([(200 + i % 50, 40) for i in range(10 ** 6)])
+
+    def run() -> None:
+        surface.size = next(sizes)
+        surface.refresh()
+
+    return run
+
+
+@benchmark('keyboard.update', number=200)
+def keyboard_update() -> Callable:
+    """Update the keyboard with thousands of key events."""
+    keyboard = softwares.Keyboard()
+    events = key_events(5000)
+    return lambda: keyboard.update(events)
+
+
+@benchmark('keyboard.push', number=10000)
+def keyboard_push() -> Callable:
+    """Query many keys of the keyboard."""
+    keyboard = softwares.Keyboard()
+    keyboard.update(key_events(52))
+    keys = ['a', 'b', 'up', 'down', pg.K_ESCAPE, 'enter', 'return', 'keypad enter']
+
+    def run() -> None:
+        for key in keys:
+            keyboard.push(key, 0.233)
+
+    return run
+
+
+@benchmark('mouse.update', number=200)
+def mouse_update() -> Callable:
+    """Update the mouse with thousands of mouse events."""
+    mouse = softwares.Mouse()
+    events = mouse_events(5000)
+    return lambda: mouse.update(events)
+
+
+@benchmark('mouse.inside', number=10000)
+def mouse_inside() -> Callable:
+    """Test the mouse position against many areas."""
+    mouse = softwares.Mouse()
+    areas = [pygame.Rect(x * 20, y * 20, 20, 20) for x in range(10) for y in range(10)]
+
+    def run() -> None:
+        for area in areas:
+            mouse.inside(area)
+
+    return run
+
+
+@benchmark('menu.reset_options', number=20)
+def menu_reset_options() -> Callable:
+    """Lay out a menu holding many options."""
+    options = [menus.Option(message="OPTION {}".format(i), font_size=24) for i in range(1000)]
+    menu = menus.Menu(options=options)
+    return menu.reset_options
+
+
+@benchmark('menu.step', number=200)
+def menu_step() -> Callable:
+    """Run full menu frames driven by posted events."""
+    menus.screen.open()
+    options = [menus.Option(message="OPTION 0", font_size=48)]
+    for i in range(1, 6):
+        options.append(menus.Option(message="OPTION {}".format(i), font_size=48, previous_option=options[-1]))
+    options[-1].next_option = options[0]
+    options[0].previous_option = options[-1]
+    menu = Menu(options=options)
+    events = [pygame.event.Event(pg.KEYDOWN, key=pg.K_DOWN, mod=0, unicode='', scancode=0),
+              pygame.event.Event(pg.KEYUP, key=pg.K_DOWN, mod=0, unicode='', scancode=0),
+              pygame.event.Event(pg.MOUSEMOTION, pos=(400, 300), rel=(1, 1), buttons=(0, 0, 0))]
+
+    def run() -> None:
+        for event in events:
+            pygame.event.post(event)
+        menu.step()
+
+    return run
+
+
+@benchmark('node.blit')
+def node_blit() -> Callable:
+    """Blit a static panel of many texts, flattened into one layer."""
+    panel = sprites.Surface(size=(400, 600), color=(40, 40, 40))
+    texts = [sprites.Text(message="ITEM {}".format(i), font_size=20) for i in range(200)]
+    layer = nodes.Node(static=True, opaque=True,
+                       children=[nodes.Node(panel)] + [nodes.Node(text, ((i % 5) * 80, (i // 5) * 14))
+                                                       for (i, text) in enumerate(texts)])
+    surface = pygame.Surface((800, 600))
+    return lambda: layer.blit_on(surface)
+
+
+@benchmark('startup.import', number=5)
+def startup_import() -> Callable:
+    """Import the menus and build the main menu in a new headless process."""
+    command = [sys.executable, '-c', "from data.menus import MainMenu; MainMenu()"]
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.run(command, cwd=directory, env=os.environ.copy(), check=True,
+                                  stdout=subprocess.DEVNULL)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Return the names of the benchmarks slower than the baseline, more than tolerance allows."""
+    slower = []
+    for (name, result) in results.items():
+        if name in baseline and result['ops'] < baseline[name]['ops'] * (1 - tolerance):
+            slower.append(name)
+    return slower
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """Run the benchmarks, return 1 if a benchmark is slower than the baseline, 0 otherwise."""
+    parser = argparse.ArgumentParser(description="Run the headless benchmarks.")
+    parser.add_argument('--filter', default='', help="run only the benchmarks whose name contains this")
+    parser.add_argument('--number', type=int, default=None, help="number of calls for every benchmark")
+    parser.add_argument('--output', default=None, help="save the results in this JSON file")
+    parser.add_argument('--baseline', default=None, help="compare the results with this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="slowdown allowed against the baseline")
+    arguments = parser.parse_args(arguments)
+    baseline = {}
+    if arguments.baseline is not None and os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)['results']
+    results = {}
+    print("{:<24}{:>14}{:>12}{:>12}{:>10}".format("benchmark", "ops/sec", "p50 (us)", "p99 (us)", "change"))
+    for (name, number, setup) in BENCHMARKS:
+        if arguments.filter not in name:
+            continue
+        results[name] = result = measure(setup(), arguments.number or number)
+        change = ""
+        if name in baseline:
+            change = "{:+.1%}".format(result['ops'] / baseline[name]['ops'] - 1)
+        print("{:<24}{:>14.1f}{:>12.1f}{:>12.1f}{:>10}".format(name, result['ops'], result['p50'], result['p99'],
+                                                              change))
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as file:
+            json.dump({'pygame': pygame.version.ver, 'python': sys.version.split()[0], 'results': results}, file,
+                      indent=2, sort_keys=True)
+    slower = compare(results, baseline, arguments.tolerance)
+    for name in slower:
+        print("SLOWER than baseline: {}".format(name))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    code = main()
+    pygame.quit()
+    sys.exit(code)
@@ -1,10 +1,17 @@
 # coding: utf-8
 
 from models.menus import Menu, Option
+from models.scenes import SceneStack
 
 from tools import softwares
 
 screen = softwares.Screen()
+scenes = SceneStack()
+
+# TEXTS OF THE MENU OPTIONS, FOCUSED OR NOT, PRELOADED BEFORE THE MENUS ARE BUILT
+MANIFEST = {'texts': [{'message': message, 'message_color': color}
+                      for message in ("PLAY", "EDITOR", "OPTIONS", "EXIT", "YES", "NO")
+                      for color in ((0, 0, 0), (255, 0, 0))]}
 
 
 class ExitMenu(Menu):
@@ -48,5 +55,8 @@ class MainMenu(Menu):
         elif self.option is self.OPTIONS:
             print(self.option.message)
         elif self.option is self.EXIT:
-            exit_menu = ExitMenu()
-            exit_menu.loop()
+            scenes.push('exit')
+
+
+scenes.register('main', MainMenu)
+scenes.register('exit', ExitMenu)
@@ -5,35 +5,51 @@ import sys
 import pygame
 import pygame.locals as pg
 
-from tools import softwares
+from tools import saves, softwares
+from tools.runners import Runner
 
 from models import menus
 
-pygame.init()
-
 clock = softwares.Clock()
-screen = softwares.Screen(title="Lab")
+screen = softwares.Screen()
+screen.title = "Lab"
 keyboard = softwares.Keyboard()
 mouse = softwares.Mouse()
+bus = softwares.EventBus()
+bus.attach(screen)
+bus.attach(keyboard)
+bus.attach(mouse)
 
 option_A = menus.Option(message="OPTION A")
 option_B = menus.Option(message="OPTION B", previous_option=option_A, next_option=option_A)
 
 main_menu = menus.Menu(options=[option_A, option_B])
 
-while screen.running:
-    events = pygame.event.get()
-    screen.update(events)
-    keyboard.update(events)
-    mouse.update(events)
+clock.stats.enabled = True
+
+
+async def autosave() -> None:
+    """Save the menu options, the sprites are packed here and the file is written on a worker thread."""
+    chunks = saves.pack(main_menu.options)
+    size = await Runner().offload(saves.write, "lab.scene", chunks)
+    print("Saved {} bytes in lab.scene".format(size))
+
+
+async def main() -> None:
+    """Run the lab menu, escape quits and S saves the menu options."""
+    main_menu.needs_full_blit = True
+    while screen.running:
+        await main_menu.step_async(120)
 
-    if keyboard.push(pg.K_ESCAPE):
-        screen.running = False
+        if keyboard.push(pg.K_ESCAPE):
+            screen.running = False
+        if keyboard.push(pg.K_s, 99):
+            Runner().start(autosave())
 
-    main_menu.loop()
 
-    pygame.display.update()
-    clock.tick(120)
+Runner().run(main())
 
+print(softwares.Startup().report())
+print(clock.stats.report())
 pygame.quit()
 sys.exit()
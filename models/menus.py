@@ -1,17 +1,25 @@
 # coding: utf-8
 
-from typing import List, Optional, Tuple
+import inspect
+from bisect import bisect_left, bisect_right
+from typing import Awaitable, List, Optional, Tuple
 
 import pygame
 
-from tools import softwares, sprites
+from tools import nodes, softwares, sprites
+from tools.runners import Runner
 
-pygame.init()
+# FRAMERATE OF THE MENUS WHICH DO NOT SLEEP UNTIL THE NEXT EVENT
+IDLE_FRAMERATE = 20
 
 clock = softwares.Clock()
 screen = softwares.Screen()
 keyboard = softwares.Keyboard()
 mouse = softwares.Mouse()
+bus = softwares.EventBus()
+bus.attach(screen)
+bus.attach(keyboard)
+bus.attach(mouse)
 
 
 class Option(sprites.Text):
@@ -22,12 +30,13 @@ class Option(sprites.Text):
                  message_color_onfocus: (int, int, int) = (255, 0, 0),
                  background_color_onblur: Optional[Tuple[int, int, int]] = None,
                  background_color_onfocus: Optional[Tuple[int, int, int]] = None,
-                 previous_option: Optional['Option'] = None, next_option: Optional['Option'] = None) -> None:
+                 previous_option: Optional['Option'] = None, next_option: Optional['Option'] = None,
+                 loaded: bool = True) -> None:
         """Create the option for the first time."""
         # CALL SUPER
         super(Option, self).__init__(pos=pos, font_filename=font_filename, font_size=font_size, antialias=antialias,
                                      message=message, message_color=message_color_onblur,
-                                     background_color=background_color_onblur)
+                                     background_color=background_color_onblur, loaded=loaded)
         # MANAGE MESSAGE COLORS
         self._message_color_onblur = message_color_onblur
         self._message_color_onfocus = message_color_onfocus
@@ -47,25 +56,41 @@ class Option(sprites.Text):
         """Manage option during 'onblur' events."""
         self._message_color = self._message_color_onblur
         self._background_color = self._background_color_onblur
-        self.reset_image()
+        self.reset_later()
 
     def onfocus(self) -> None:
         """Manage option during 'onfocus' events."""
         self._message_color = self._message_color_onfocus
         self._background_color = self._background_color_onfocus
-        self.reset_image()
+        self.reset_later()
 
 
 class Menu(sprites.Surface):
     """Manage menus."""
 
+    layered = True
+
     def __init__(self, options: Optional[List['Option']] = None, pos: (int, int) = (0, 0),
-                 size: (int, int) = screen.size, background_color: (int, int, int) = (255, 255, 255)) -> None:
-        """Create the menu for the first time."""
+                 size: Optional[Tuple[int, int]] = None, background_color: (int, int, int) = (255, 255, 255),
+                 dirty_rects: bool = True, idle: bool = True, idle_timeout: int = 1000) -> None:
+        """Create the menu for the first time, as large as the screen if size is None, following its size then."""
         # CALL SUPER
+        self.fit = size is None
+        if size is None:
+            size = screen.size
         super(Menu, self).__init__(pos=pos, size=size, color=background_color)
+        # MANAGE RENDERING
+        self.dirty_rects = dirty_rects
+        self.needs_full_blit = True
+        self._screen_revision = None
+        self._screen_mode = screen.mode
+        # MANAGE IDLE MODE
+        self.idle = idle
+        self.idle_timeout = idle_timeout
         # MANAGE OPTIONS
         self.options = options if options is not None else []
+        self.index = sprites.SpatialGrid()
+        self.layer = None
         self.reset_options()
         # MANAGE FOCUSED OPTION
         self.option = None
@@ -76,11 +101,57 @@ class Menu(sprites.Surface):
         self.running = True
 
     def reset_options(self) -> None:
-        """Manage some arguments of the menu options."""
-        for (i, option) in enumerate(self.options):
+        """Manage some arguments of the menu options, the menu is displayed again entirely."""
+        self.needs_full_blit = True
+        self.index.clear()
+        top = (self.height - sum([option.height for option in self.options])) / 2
+        for option in self.options:
             option.menu = self
-            option.pos = ((self.width - option.width) / 2, sum([self.options[j].height for j in range(i)]) +
-                          (self.height - sum([option.height for option in self.options])) / 2)
+            option.pos = ((self.width - option.width) / 2, top)
+            top += option.height
+            self.index.add(option)
+        self.reset_layer()
+
+    def __getstate__(self) -> dict:
+        """Use to pickle the menu, without its layer. Overriding method."""
+        dict_ = super(Menu, self).__getstate__()
+        dict_['layer'] = None
+        return dict_
+
+    def reset_layer(self) -> None:
+        """Flatten the background and the options into one static layer, composed again when one of them changes."""
+        if self.layer is not None:
+            self.layer.release()
+        self.layer = nodes.Node(static=True, opaque=True,
+                                children=[nodes.Node(self)] + [nodes.Node(option) for option in self.options])
+
+    def reset_layout(self) -> None:
+        """Follow the screen size if the menu fits the screen, and lay out the options again. Called once per mode."""
+        if self.fit and self.size != screen.size:
+            self.size = screen.size
+            self.reset_options()
+
+    def visible_options(self) -> List['Option']:
+        """Return the options to display."""
+        return self.options
+
+    def enter(self) -> None:
+        """Manage the menu when it becomes the current scene: it is displayed again entirely."""
+        self.running = True
+        self.needs_full_blit = True
+
+    def leave(self) -> None:
+        """Manage the menu when it stops being the current scene. Need to be overridden."""
+        pass
+
+    def preload(self) -> None:
+        """Render the images of the visible options now, so the first frame of the menu renders nothing."""
+        for option in self.visible_options():
+            option.refresh()
+
+    def update(self) -> None:
+        """Update the menu once per frame, after the events and before the display. Need to be overridden."""
+        pass
 
     def focus(self, option: Option) -> None:
         """Focus a new option in the menu."""
@@ -89,39 +160,321 @@ class Menu(sprites.Surface):
             self.option = option
             self.option.onfocus()
 
-    def apply(self) -> None:
-        """Apply an action depending on the focused option. Need to be overridden."""
+    def apply(self) -> Optional[Awaitable]:
+        """
+        Apply an action depending on the focused option. Need to be overridden.
+        ------------------------------------------------------------------------
+        The action may return an awaitable, a coroutine offloading blocking work for example,
+        it runs as a task alongside the frames of the menu.
+        """
         print(self.option.message)
 
-    def blit_on(self, surface: pygame.Surface) -> None:
-        """Blit the menu onto the surface. Overriding method."""
-        super(Menu, self).blit_on(surface)
-        for option in self.options:
-            option.blit_on(surface)
+    def blit_on(self, surface: pygame.Surface) -> List[pygame.Rect]:
+        """
+        Blit the menu onto the surface. Overriding method.
+        --------------------------------------------------
+        In dirty rects mode, only the options which changed since the last blit are displayed again,
+        on top of the matching part of the background.
+        Otherwise, or if the menu changed or needs_full_blit is True, the menu is displayed entirely,
+        from its layer if it has one, in one blit.
+        Return the list of the surface areas which changed.
+        """
+        if not self.dirty_rects or self._dirty or self.needs_full_blit:
+            self.needs_full_blit = False
+            if self.layered:
+                if self.layer is None:
+                    self.reset_layer()
+                return self.layer.blit_on(surface)
+            area = super(Menu, self).blit_on(surface)
+            for option in self.visible_options():
+                option.blit_on(surface)
+            return [area]
+        rects = []
+        for option in self.visible_options():
+            if option.dirty:
+                rects.extend(option.dirty_areas())
+        if not rects:
+            return rects
+        for rect in rects:
+            surface.blit(self.image, rect, rect.move(-self.x, -self.y))
+        for option in self.visible_options():
+            if option.area.collidelist(rects) != -1:
+                option.blit_on(surface)
+        return rects
+
+    def step(self) -> List[pygame.Rect]:
+        """
+        Manage one frame of the menu: events, focus, display and action.
+        -----------------------------------------------------------------
+        Return the list of the screen areas which changed.
+        """
+        bus.pump()
+        clock.mark('events')
+        if self.option is not None:
+            if keyboard.push('up', 0.233):
+                if self.option.previous_option is not None:
+                    self.focus(self.option.previous_option)
+            if keyboard.push('down', 0.233):
+                if self.option.next_option is not None:
+                    self.focus(self.option.next_option)
+            if mouse.move():
+                self.focus(mouse.hover(self.index, self.option))
+        # THE WINDOW IS OPENED BEFORE THE REVISION IS READ, SO ITS OPENING IS NOT SEEN AS A CHANGE THE NEXT FRAME
+        screen.open()
+        if screen.revision != self._screen_revision:
+            if screen.mode != self._screen_mode:
+                self._screen_mode = screen.mode
+                self.reset_layout()
+            self.needs_full_blit = True
+        self.update()
+        clock.mark('focus')
+        rects = self.blit_on(screen.image)
+        clock.mark('blit')
+        screen.display(rects)
+        self._screen_revision = screen.revision
+        clock.mark('display')
+        if self.option is not None:
+            if (any([keyboard.push(key, 99) for key in ['enter', 'return', 'keypad enter']])
+                    or (mouse.push(1, 99) and mouse.inside(self.option.area))):
+                action = self.apply()
+                if inspect.isawaitable(action):
+                    Runner().start(action)
+        clock.mark('apply')
+        return rects
+
+    def still(self, rects: List[pygame.Rect]) -> bool:
+        """Know if the menu can sleep until the next event: nothing changed and no key repeat is pending."""
+        return self.idle and not rects and not keyboard.held and not mouse.held
 
     def loop(self) -> None:
-        """Manage events in the menu."""
+        """
+        Manage events in the menu.
+        --------------------------
+        Every step is followed by a wait(), the loop sleeps in idle mode when a frame changed nothing.
+        """
+        self.needs_full_blit = True
         while screen.running and self.running:
-            events = pygame.event.get()
-            screen.update(events)
-            keyboard.update(events)
-            mouse.update(events)
-            if self.option is not None:
-                if keyboard.push('up', 0.233):
-                    if self.option.previous_option is not None:
-                        self.focus(self.option.previous_option)
-                if keyboard.push('down', 0.233):
-                    if self.option.next_option is not None:
-                        self.focus(self.option.next_option)
-                if mouse.move() and not mouse.inside(self.option.area):
-                    for option in self.options:
-                        if mouse.inside(option.area):
-                            self.focus(option)
-                            break
-            self.blit_on(screen.image)
-            pygame.display.update()
-            clock.tick(20)
+            self.wait(self.step())
+
+    def wait(self, rects: List[pygame.Rect]) -> None:
+        """
+        Wait for the next frame after a step which changed rects.
+        ----------------------------------------------------------
+        In idle mode, when the frame changed nothing, sleep until an event arrives, idle_timeout passes
+        or the next timer of the clock is due.
+        """
+        if self.still(rects) and screen.running and self.running:
+            timeout = self.idle_timeout
+            remaining = clock.time_until_next()
+            if remaining is not None:
+                timeout = min(timeout, int(remaining * 1000) + 1)
+            bus.wait(timeout)
+            clock.mark('idle')
+            clock.tick()
+        else:
+            clock.tick(IDLE_FRAMERATE)
+
+    async def step_async(self, framerate: int = 60) -> List[pygame.Rect]:
+        """
+        Manage one frame of the menu like step(), then give the rest of the frame to the other tasks.
+        ------------------------------------------------------------------------------------------------
+        The frame is paced at framerate, or at IDLE_FRAMERATE when the menu is still.
+        Return the list of the screen areas which changed.
+        """
+        rects = self.step()
+        await clock.tick_async(IDLE_FRAMERATE if self.still(rects) else framerate)
+        return rects
+
+    async def loop_async(self, framerate: int = 60) -> None:
+        """
+        Manage events in the menu, without blocking the asyncio event loop.
+        --------------------------------------------------------------------
+        Usage:
+        > Runner().run(menu.loop_async())
+        """
+        self.needs_full_blit = True
+        while screen.running and self.running:
+            await self.step_async(framerate)
+
+
+class ScrollMenu(Menu):
+    """
+    Manage menus holding more options than they can display.
+    --------------------------------------------------------
+    The options are laid out with a prefix sum of their heights, updated from the changed option only,
+    and their indices are kept beside it.
+    Only the options inside the menu area are indexed, displayed and keep a rendered image.
+    The view scrolls smoothly to the focused option, or with the mouse wheel.
+    The options move while scrolling, the menu is not flattened into a layer.
+    """
+
+    layered = False
+
+    def __init__(self, options: Optional[List['Option']] = None, pos: (int, int) = (0, 0),
+                 size: Optional[Tuple[int, int]] = None, background_color: (int, int, int) = (255, 255, 255),
+                 dirty_rects: bool = True, idle: bool = True, idle_timeout: int = 1000, scroll_speed: float = 0.3,
+                 wheel_step: int = 60) -> None:
+        """Create the scroll menu for the first time."""
+        # MANAGE SCROLLING
+        self.scroll_speed = scroll_speed
+        self.wheel_step = wheel_step
+        self._scroll = 0.0
+        self._target = 0.0
+        self._offsets = [0]
+        self._indices = {}
+        self._first = 0
+        self._last = 0
+        # CALL SUPER
+        super(ScrollMenu, self).__init__(options=options, pos=pos, size=size, background_color=background_color,
+                                         dirty_rects=dirty_rects, idle=idle, idle_timeout=idle_timeout)
+
+    def reset_options(self) -> None:
+        """Manage some arguments of the menu options. Overriding method."""
+        self._offsets = [0]
+        self._indices = {}
+        for (i, option) in enumerate(self.options):
+            option.menu = self
+            self._offsets.append(self._offsets[-1] + option.height)
+            self._indices[option] = i
+        self._target = self._scroll = self._clamp(self._target)
+        self.reset_view(force=True)
+        for (i, option) in enumerate(self.options):
+            if not self._first <= i < self._last:
+                option.unload()
+
+    def insert(self, i: int, option: 'Option') -> None:
+        """Insert an option before the i-th one, and link it to its neighbours."""
+        i = max(0, min(i, len(self.options)))
+        previous_option = self.options[i - 1] if i > 0 else None
+        next_option = self.options[i] if i < len(self.options) else None
+        if previous_option is not None:
+            previous_option.next_option = option
+        option.previous_option = previous_option
+        if next_option is not None:
+            next_option.previous_option = option
+        option.next_option = next_option
+        option.menu = self
+        option.unload()
+        self.options.insert(i, option)
+        height = option.height
+        self._offsets.insert(i + 1, self._offsets[i] + height)
+        self._offsets[i + 2:] = [offset + height for offset in self._offsets[i + 2:]]
+        self.reset_indices(i)
+        if self.option is None:
+            self.option = option
+            option.onfocus()
+        self.reset_view(force=True)
+
+    def append(self, option: 'Option') -> None:
+        """Add an option after the last one."""
+        self.insert(len(self.options), option)
+
+    def remove(self, option: 'Option') -> None:
+        """Remove an option, and link its neighbours together."""
+        i = self._indices[option]
+        if option.previous_option is not None:
+            option.previous_option.next_option = option.next_option
+        if option.next_option is not None:
+            option.next_option.previous_option = option.previous_option
+        if option is self.option:
+            self.option = option.next_option or option.previous_option
             if self.option is not None:
-                if (any([keyboard.push(key, 99) for key in ['enter', 'return', 'keypad enter']])
-                        or (mouse.push(1, 99) and mouse.inside(self.option.area))):
-                    self.apply()
+                self.option.onfocus()
+        del self.options[i]
+        height = self._offsets[i + 1] - self._offsets[i]
+        del self._offsets[i + 1]
+        self._offsets[i + 1:] = [offset - height for offset in self._offsets[i + 1:]]
+        del self._indices[option]
+        self.reset_indices(i)
+        self.index.remove(option)
+        option.unload()
+        self._target = self._clamp(self._target)
+        self.reset_view(force=True)
+
+    def reset_indices(self, first: int = 0) -> None:
+        """Store the index of every option from the first-th one, after an option was inserted or removed."""
+        for i in range(first, len(self.options)):
+            self._indices[self.options[i]] = i
+
+    def _clamp(self, scroll: float) -> float:
+        """Return the nearest scroll value which keeps the view inside the options."""
+        return max(0.0, min(scroll, float(self._offsets[-1] - self.height)))
+
+    def _top(self) -> float:
+        """Return the y position of the first option, the options are centered if they are not scrolled."""
+        return max(0.0, (self.height - self._offsets[-1]) / 2) - self._scroll
+
+    def reset_view(self, force: bool = False) -> None:
+        """Position and index the visible options, unload the options which are not visible anymore."""
+        first = max(0, bisect_right(self._offsets, self._scroll) - 1)
+        last = min(len(self.options), bisect_left(self._offsets, self._scroll + self.height))
+        if force or (first, last) != (self._first, self._last):
+            visible = set(self.options[first:last])
+            for option in list(self.index):
+                if option not in visible:
+                    self.index.remove(option)
+                    option.unload()
+            self._first, self._last = first, last
+            self.needs_full_blit = True
+        top = self._top()
+        for i in range(first, last):
+            option = self.options[i]
+            option.pos = ((self.width - option.width) / 2, top + self._offsets[i])
+            self.index.add(option)
+
+    def still(self, rects: List[pygame.Rect]) -> bool:
+        """Know if the menu can sleep until the next event, it can not while scrolling. Overriding method."""
+        return self._scroll == self._target and super(ScrollMenu, self).still(rects)
+
+    def visible_options(self) -> List['Option']:
+        """Return the options inside the menu area. Overriding method."""
+        return self.options[self._first:self._last]
+
+    def scroll_to(self, offset: float) -> None:
+        """Scroll smoothly until the top of the view is at offset."""
+        self._target = self._clamp(offset)
+
+    def scroll_by(self, delta: float) -> None:
+        """Scroll smoothly of delta pixels."""
+        self.scroll_to(self._target + delta)
+
+    def update_scroll(self) -> None:
+        """Move the view toward its target, the options move with it."""
+        if self._scroll != self._target:
+            self._scroll += (self._target - self._scroll) * self.scroll_speed
+            if abs(self._target - self._scroll) < 1:
+                self._scroll = self._target
+            self.reset_view()
+            self.needs_full_blit = True
+
+    def focus(self, option: Option) -> None:
+        """Focus a new option in the menu, and scroll to show it. Overriding method."""
+        super(ScrollMenu, self).focus(option)
+        if option is not None:
+            i = self._indices[option]
+            if self._offsets[i] < self._target:
+                self.scroll_to(self._offsets[i])
+            elif self._offsets[i + 1] > self._target + self.height:
+                self.scroll_to(self._offsets[i + 1] - self.height)
+
+    def blit_on(self, surface: pygame.Surface) -> List[pygame.Rect]:
+        """Blit the menu onto the surface, the options are clipped to the menu area. Overriding method."""
+        clip = surface.get_clip()
+        surface.set_clip(self._area.clip(clip))
+        rects = super(ScrollMenu, self).blit_on(surface)
+        surface.set_clip(clip)
+        rects = [rect.clip(self._area) for rect in rects]
+        return [rect for rect in rects if rect.width and rect.height]
+
+    def update(self) -> None:
+        """Scroll with the mouse wheel and move the view toward its target. Overriding method."""
+        if mouse.push(4) and mouse.inside(self._area):
+            self.scroll_by(-self.wheel_step)
+        if mouse.push(5) and mouse.inside(self._area):
+            self.scroll_by(self.wheel_step)
+        self.update_scroll()
+
+    @property
+    def scroll(self) -> float:
+        """Return the current scroll offset of the view."""
+        return self._scroll
@@ -0,0 +1,144 @@
+# coding: utf-8
+
+from typing import Callable, Dict, List, Optional, Union
+
+import pygame
+
+from tools import decorators
+from tools.runners import Runner
+
+from models.menus import IDLE_FRAMERATE, Menu, clock, screen
+
+
+@decorators.singleton(parameters=False)
+class SceneStack(object):
+    """
+    Manage the menus as a stack of scenes run by one main loop, using the singleton decorator.
+    -------------------------------------------------------------------------------------------
+    Only the scene on top of the stack runs, the scenes under it wait with their state and rendered images.
+    The scenes are registered by name with a factory, built once and cached, so going back to a scene
+    renders nothing again. A scene is popped when it stops running, like a menu loop ends.
+    Usage:
+    > scenes = SceneStack()
+    > scenes.register('main', MainMenu)
+    > scenes.register('exit', ExitMenu)
+    > scenes.push('main')
+    > scenes.preload('exit', delay=0)
+    > scenes.loop()
+    """
+
+    def __init__(self) -> None:
+        """Create the scene stack for the first time."""
+        self._stack = []
+        self._factories = {}
+        self._scenes = {}
+
+    def register(self, name: str, factory: Callable[[], Menu]) -> None:
+        """Give the factory building the scene of a name, the first time it is asked."""
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Menu:
+        """Return the scene of a name, build it the first time."""
+        scene = self._scenes.get(name)
+        if scene is None:
+            scene = self._scenes[name] = self._factories[name]()
+        return scene
+
+    def preload(self, name: str, delay: Optional[float] = None) -> None:
+        """Build the scene of a name and render its images, now, or after delay seconds at a tick of the clock."""
+        if delay is not None:
+            clock.call_later(delay, self.preload, name)
+            return
+        self.get(name).preload()
+
+    def forget(self, name: str) -> None:
+        """Drop the cached scene of a name, it is built again the next time it is asked."""
+        self._scenes.pop(name, None)
+
+    def _scene(self, scene: Union[str, Menu]) -> Menu:
+        """Return a scene, or the cached scene of a name."""
+        return self.get(scene) if isinstance(scene, str) else scene
+
+    def push(self, scene: Union[str, Menu]) -> Menu:
+        """Run a scene, or the scene of a name, on top of the current one. Return it."""
+        scene = self._scene(scene)
+        if self._stack:
+            self._stack[-1].leave()
+        self._stack.append(scene)
+        scene.enter()
+        return scene
+
+    def pop(self) -> Optional[Menu]:
+        """Stop the current scene and run the one under it again. Return the stopped scene."""
+        if not self._stack:
+            return None
+        scene = self._stack.pop()
+        scene.leave()
+        if self._stack:
+            self._stack[-1].enter()
+        return scene
+
+    def replace(self, scene: Union[str, Menu]) -> Menu:
+        """Run a scene, or the scene of a name, in place of the current one. Return it."""
+        scene = self._scene(scene)
+        if self._stack:
+            self._stack.pop().leave()
+        self._stack.append(scene)
+        scene.enter()
+        return scene
+
+    def step(self) -> List[pygame.Rect]:
+        """
+        Manage one frame of the current scene, then pop it if it stopped running.
+        --------------------------------------------------------------------------
+        Return the list of the screen areas which changed.
+        """
+        scene = self._stack[-1]
+        rects = scene.step()
+        if not scene.running and self._stack and self._stack[-1] is scene:
+            self.pop()
+        return rects
+
+    def loop(self) -> None:
+        """Manage events in the current scene until the screen stops running or the stack is empty."""
+        while screen.running and self._stack:
+            scene = self._stack[-1]
+            rects = self.step()
+            if self._stack and self._stack[-1] is scene:
+                scene.wait(rects)
+            else:
+                clock.tick()
+
+    async def loop_async(self, framerate: int = 60) -> None:
+        """
+        Manage events in the current scene without blocking the asyncio event loop.
+        ----------------------------------------------------------------------------
+        Usage:
+        > Runner().run(SceneStack().loop_async())
+        """
+        while screen.running and self._stack:
+            scene = self._stack[-1]
+            rects = self.step()
+            still = self._stack and self._stack[-1] is scene and scene.still(rects)
+            await clock.tick_async(IDLE_FRAMERATE if still else framerate)
+
+    def run(self, asynchronous: bool = False) -> None:
+        """Run the main loop, in asyncio if asynchronous is True."""
+        if asynchronous:
+            Runner().run(self.loop_async())
+        else:
+            self.loop()
+
+    @property
+    def current(self) -> Optional[Menu]:
+        """Return the scene on top of the stack, None if it is empty."""
+        return self._stack[-1] if self._stack else None
+
+    @property
+    def scenes(self) -> Dict[str, Menu]:
+        """Return the cached scenes, keyed on their name."""
+        return dict(self._scenes)
+
+    def __len__(self) -> int:
+        """Return the number of scenes in the stack."""
+        return len(self._stack)
@@ -1,14 +1,56 @@
 # coding: utf-8
 
 import sys
+from typing import Optional
+
 import pygame
 
-from data.menus import MainMenu
+from tools.softwares import Startup
+from data.menus import MANIFEST, scenes
+from models.menus import bus, clock, screen
+from tools.preloaders import Preloader
+from tools.recordings import Player, Recorder
+from tools.sprites import Surface
+
+
+def argument(name: str) -> Optional[str]:
+    """Return the value following name in the command line, None if there is none."""
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+
+Startup().mark('import')
 
-pygame.init()
+preloader = Preloader(manifest=MANIFEST)
+preloader.start()
+# LOADING SCREEN: A BAR GROWING AT THE BOTTOM OF THE WINDOW WHILE THE MANIFEST IS PRELOADED
+screen.open()
+bar = Surface(pos=(0, screen.height - 8), size=(1, 8), pooled=True)
+while screen.running and not preloader.done:
+    bus.pump()
+    preloader.poll()
+    bar.width = max(1, int(screen.width * preloader.progress))
+    screen.image.fill((255, 255, 255))
+    bar.blit_on(screen.image)
+    screen.display()
+    clock.tick(60)
+preloader.shutdown()
+Startup().mark('preload')
 
-main_menu = MainMenu()
-main_menu.loop()
+scenes.push('main')
+scenes.preload('exit', delay=0)
+Startup().mark('menus')
+if argument('--record') is not None:
+    with Recorder(argument('--record')):
+        scenes.run(asynchronous='--async' in sys.argv)
+elif argument('--replay') is not None:
+    with Player(argument('--replay'), realtime='--realtime' in sys.argv):
+        scenes.run(asynchronous='--async' in sys.argv)
+else:
+    scenes.run(asynchronous='--async' in sys.argv)
 
+if '--startup' in sys.argv:
+    print(Startup().report())
 pygame.quit()
 sys.exit()
@@ -0,0 +1,212 @@
+# coding: utf-8
+
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import pygame
+import pygame.locals as pg
+
+from tools import decorators
+from tools.softwares import Screen
+
+
+class Asset(object):
+    """Keep an image loaded from a file, converted to the screen pixel format, and the sprites using it."""
+
+    __slots__ = ('filename', 'alpha', 'image', 'users', 'bytes', 'load_time')
+
+    def __init__(self, filename: str, alpha: bool, image: pygame.Surface, load_time: float) -> None:
+        """Create the asset for the first time."""
+        self.filename = filename
+        self.alpha = alpha
+        self.image = image
+        self.users = weakref.WeakSet()
+        self.bytes = image.get_pitch() * image.get_height()
+        self.load_time = load_time
+
+    @property
+    def references(self) -> int:
+        """Return the number of sprites using the asset."""
+        return len(self.users)
+
+
+@decorators.singleton(parameters=False)
+class AssetManager(object):
+    """
+    Load every image file once and share it between the sprites, using the singleton decorator.
+    -------------------------------------------------------------------------------------------
+    The images are converted to the screen pixel format, so they are blitted without per-pixel conversion,
+    and converted again when the display mode changes the format.
+    The assets no sprite uses are kept while they fit in max_bytes, the least recently used first evicted.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        """Create the asset manager for the first time."""
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._assets = OrderedDict()
+        self._format = None
+        self.loads = 0
+        self.hits = 0
+        self.conversions = 0
+        self.evictions = 0
+        self.load_time = 0.0
+        screen = Screen()
+        screen.watch(self.reset_format)
+        self._format = self.get_format()
+
+    @staticmethod
+    def get_format() -> Optional[tuple]:
+        """Return the current pixel format of the screen, None if there is no display mode set."""
+        surface = pygame.display.get_surface()
+        if surface is None:
+            return None
+        return (surface.get_bitsize(), surface.get_masks())
+
+    @staticmethod
+    def convert(image: pygame.Surface, alpha: bool) -> pygame.Surface:
+        """Return the image converted to the screen pixel format, the image itself if there is no display."""
+        if pygame.display.get_surface() is None:
+            return image
+        if alpha:
+            return image.convert_alpha()
+        return image.convert()
+
+    def load(self, filename: str, alpha: Optional[bool] = None) -> pygame.Surface:
+        """
+        Return the converted image of a file, loaded from the disk only the first time.
+        -------------------------------------------------------------------------------
+        The image keeps its per-pixel alpha if alpha is True, loses it if alpha is False,
+        and keeps it only if the file has one if alpha is None.
+        The returned image is shared between every caller and must not be modified.
+        """
+        return self._get(filename, alpha).image
+
+    def acquire(self, filename: str, user: object, alpha: Optional[bool] = None) -> pygame.Surface:
+        """Return the converted image of a file like load(), the asset is kept while user is alive or not released."""
+        return self._get(filename, alpha, user).image
+
+    def release(self, filename: str, user: object, alpha: Optional[bool] = None) -> None:
+        """Tell an asset is not used anymore by user, it may be evicted then."""
+        asset = self._assets.get((filename, alpha))
+        if asset is not None:
+            asset.users.discard(user)
+            self.reduce(self._max_bytes)
+
+    def _get(self, filename: str, alpha: Optional[bool], user: Optional[object] = None) -> Asset:
+        """Return the asset of a file used by user if it is not None, load it if there is none."""
+        key = (filename, alpha)
+        asset = self._assets.get(key)
+        if asset is not None:
+            self._assets.move_to_end(key)
+            self.hits += 1
+            if user is not None:
+                asset.users.add(user)
+            return asset
+        start = time.perf_counter()
+        image = pygame.image.load(filename)
+        return self._store(filename, alpha, image, time.perf_counter() - start, user)
+
+    def store(self, filename: str, image: pygame.Surface, alpha: Optional[bool] = None,
+              load_time: float = 0.0) -> pygame.Surface:
+        """Add an image loaded elsewhere from a file, return it converted like load() does."""
+        asset = self._assets.get((filename, alpha))
+        if asset is None:
+            asset = self._store(filename, alpha, image, load_time)
+        return asset.image
+
+    def _store(self, filename: str, alpha: Optional[bool], image: pygame.Surface, load_time: float,
+               user: Optional[object] = None) -> Asset:
+        """Convert an image loaded from a file and keep it as an asset, used by user if it is not None."""
+        key = (filename, alpha)
+        start = time.perf_counter()
+        if alpha is None:
+            alpha = bool(image.get_flags() & pg.SRCALPHA)
+        image = self.convert(image, alpha)
+        load_time += time.perf_counter() - start
+        asset = Asset(filename, alpha, image, load_time)
+        if user is not None:
+            # THE USER IS ADDED BEFORE THE REDUCTION, SO THE NEW ASSET IS NOT EVICTED AT ONCE
+            asset.users.add(user)
+        self._assets[key] = asset
+        self._bytes += asset.bytes
+        self.loads += 1
+        self.load_time += load_time
+        self.reduce(self._max_bytes)
+        return asset
+
+    def reset_format(self, screen: Optional[Screen] = None) -> None:
+        """Convert every asset again if the screen pixel format changed. Called by the screen when its mode is set."""
+        format_ = self.get_format()
+        if format_ == self._format:
+            return
+        self._format = format_
+        self._bytes = 0
+        assets = list(self._assets.values())
+        for asset in assets:
+            asset.image = self.convert(asset.image, asset.alpha)
+            asset.bytes = asset.image.get_pitch() * asset.image.get_height()
+            self._bytes += asset.bytes
+            self.conversions += 1
+        for asset in assets:
+            for user in list(asset.users):
+                user.reset_later()
+
+    def reduce(self, max_bytes: int) -> None:
+        """Evict the least recently used assets no sprite uses until the manager fits in max_bytes."""
+        if self._bytes <= max_bytes:
+            return
+        for key in list(self._assets):
+            asset = self._assets[key]
+            if not asset.users:
+                del self._assets[key]
+                self._bytes -= asset.bytes
+                self.evictions += 1
+                if self._bytes <= max_bytes:
+                    return
+
+    def clear(self) -> None:
+        """Evict every asset no sprite uses."""
+        self.reduce(-1)
+
+    def references(self, filename: str, alpha: Optional[bool] = None) -> int:
+        """Return the number of sprites using the asset of a file."""
+        asset = self._assets.get((filename, alpha))
+        return asset.references if asset is not None else 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the manager, the memory used and the time spent loading the files."""
+        return {'assets': len(self._assets),
+                'used': sum([1 for asset in self._assets.values() if asset.users]),
+                'bytes': self._bytes,
+                'loads': self.loads,
+                'hits': self.hits,
+                'conversions': self.conversions,
+                'evictions': self.evictions,
+                'load_time': self.load_time}
+
+    def __len__(self) -> int:
+        """Return the number of assets in the manager."""
+        return len(self._assets)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Know if an asset is loaded for a (filename, alpha) key."""
+        return key in self._assets
+
+    @property
+    def bytes(self) -> int:
+        """Return the current memory used by the assets."""
+        return self._bytes
+
+    @property
+    def max_bytes(self) -> int:
+        """Return the current memory budget of the manager."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        """Modify the memory budget of the manager."""
+        self._max_bytes = value
+        self.reduce(value)
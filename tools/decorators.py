@@ -1,13 +1,87 @@
 # coding: utf-8
 
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
 
-def singleton(parameters=False):
+
+class Registry(object):
+    """Store the instances created by a class, keyed on hashable arguments."""
+
+    def __init__(self, max_size: Optional[int] = None, weak: bool = False) -> None:
+        """Create the registry for the first time."""
+        self._max_size = max_size
+        self._weak = weak
+        self._instances = OrderedDict()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return the instance stored for key, create it with factory if there is none.
+        ----------------------------------------------------------------------------
+        The least recently used instances are forgotten when the registry grows over max_size.
+        Weak instances are forgotten as soon as nobody else uses them.
+        """
+        instance = self._instances.get(key)
+        if instance is not None:
+            if self._weak:
+                instance = instance()
+            if instance is not None:
+                self._instances.move_to_end(key)
+                return instance
+        instance = factory()
+        if self._weak:
+            self._instances[key] = weakref.ref(instance, self._forget(key))
+        else:
+            self._instances[key] = instance
+        if self._max_size is not None:
+            while len(self._instances) > self._max_size:
+                self._instances.popitem(last=False)
+        return instance
+
+    def _forget(self, key: Hashable) -> Callable[[weakref.ref], None]:
+        """Return the callback removing key when its weak instance dies."""
+        instances = weakref.ref(self._instances)
+
+        def callback(reference: weakref.ref) -> None:
+            """Remove key if it still refers to the dead instance."""
+            instances_ = instances()
+            if instances_ is not None and instances_.get(key) is reference:
+                del instances_[key]
+
+        return callback
+
+    def clear(self) -> None:
+        """Forget every instance of the registry."""
+        self._instances.clear()
+
+    def __len__(self) -> int:
+        """Return the number of instances in the registry."""
+        return len(self._instances)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Know if an instance is stored for key."""
+        return key in self._instances
+
+    @property
+    def max_size(self) -> Optional[int]:
+        """Return the current maximum number of instances."""
+        return self._max_size
+
+    @property
+    def weak(self) -> bool:
+        """Return True if the instances are weakly referenced, False otherwise."""
+        return self._weak
+
+
+def singleton(parameters: bool = False, max_size: Optional[int] = None, weak: bool = False):
     """
     Return the singleton class decorator.
     -------------------------------------
     Arguments:
     - parameters: True if the instance returned by the singleton class
     decorator has to depend on the class arguments, False otherwise.
+    - max_size: the maximum number of instances kept, None for no limit.
+    - weak: True if the instances have to be forgotten when nobody else uses them, False otherwise.
     ----------------------------------------------------------------
     Return:
     - function: the singleton class decorator.
@@ -27,19 +101,19 @@ def singleton(parameters=False):
     > C = Singleton(3)
     > print(A is B)  # True
     > print(A is C)  # False
+    > print(len(Singleton.registry))  # 2
     """
 
     def decorator(cls):
         """Return the singleton class wrapper."""
-        instances = {}
+        registry = Registry(max_size=max_size, weak=weak)
 
         def wrapper(*args, **kwargs):
             """Return the single instance of the cls class, depends on args."""
-            key = (cls, args, str(kwargs)) if parameters else cls
-            if key not in instances:
-                instances[key] = cls(*args, **kwargs)
-            return instances[key]
+            key = (args, tuple(sorted(kwargs.items()))) if parameters else None
+            return registry.get(key, lambda: cls(*args, **kwargs))
 
+        wrapper.registry = registry
         return wrapper
 
     return decorator
@@ -0,0 +1,193 @@
+# coding: utf-8
+
+from typing import Iterator, List, Optional, Sequence, Union
+
+import numpy
+import pygame
+
+from tools.sprites import Sprite
+
+
+class SpriteGroup(object):
+    """
+    Manage many sprites at once, their positions, sizes and depths are stored in NumPy columns.
+    -------------------------------------------------------------------------------------------
+    The group moves its sprites with vectorized operations and draws them with one Surface.blits() call,
+    from the lowest to the highest z, the draw order being sorted again only when a z changes.
+    The sprites positions are written back to the sprites lazily, when sync() is called.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        """Create the sprite group for the first time."""
+        self._sprites = []
+        self._slots = {}
+        self._xy = numpy.zeros((capacity, 2), dtype=numpy.float64)
+        self._known = numpy.zeros((capacity, 2), dtype=numpy.float64)
+        self._size = numpy.zeros((capacity, 2), dtype=numpy.int32)
+        self._z = numpy.zeros(capacity, dtype=numpy.float64)
+        self._order = None
+        self._draw_images = None
+        self._synced = True
+        self._syncing = False
+
+    def __len__(self) -> int:
+        """Return the number of sprites in the group."""
+        return len(self._sprites)
+
+    def __iter__(self) -> Iterator[Sprite]:
+        """Iterate over the sprites of the group."""
+        return iter(self._sprites)
+
+    def __contains__(self, sprite: Sprite) -> bool:
+        """Know if a sprite is in the group."""
+        return sprite in self._slots
+
+    def _grow(self) -> None:
+        """Double the capacity of the columns."""
+        capacity = 2 * len(self._z)
+        self._xy = numpy.resize(self._xy, (capacity, 2))
+        self._known = numpy.resize(self._known, (capacity, 2))
+        self._size = numpy.resize(self._size, (capacity, 2))
+        self._z = numpy.resize(self._z, capacity)
+
+    def add(self, sprite: Sprite, z: float = 0) -> None:
+        """Add a sprite to the group, drawn above the sprites with a lower z."""
+        if sprite in self._slots:
+            self.set_z(sprite, z)
+            return
+        slot = len(self._sprites)
+        if slot == len(self._z):
+            self._grow()
+        self._slots[sprite] = slot
+        self._sprites.append(sprite)
+        self._xy[slot] = self._known[slot] = sprite.pos
+        self._size[slot] = sprite.size
+        self._z[slot] = z
+        self._order = None
+        sprite.watch(self.update)
+
+    def remove(self, sprite: Sprite) -> None:
+        """Remove a sprite from the group, its position is written back first."""
+        slot = self._slots.pop(sprite, None)
+        if slot is None:
+            return
+        self._sync(slot)
+        sprite.unwatch(self.update)
+        last = len(self._sprites) - 1
+        if slot != last:
+            moved = self._sprites[last]
+            self._sprites[slot] = moved
+            self._xy[slot] = self._xy[last]
+            self._known[slot] = self._known[last]
+            self._size[slot] = self._size[last]
+            self._z[slot] = self._z[last]
+            self._slots[moved] = slot
+        self._sprites.pop()
+        self._order = None
+
+    def clear(self) -> None:
+        """Remove every sprite from the group."""
+        self.sync()
+        for sprite in self._sprites:
+            sprite.unwatch(self.update)
+        self._sprites = []
+        self._slots = {}
+        self._order = None
+
+    def update(self, sprite: Sprite) -> None:
+        """
+        Copy the size of a sprite in the columns. Called by the sprite when it changes.
+        -----------------------------------------------------------------------------------------
+        The position is copied only if the sprite moved itself, the moves of the group are kept otherwise.
+        """
+        if self._syncing:
+            return
+        slot = self._slots[sprite]
+        pos = sprite.pos
+        if pos[0] != self._known[slot, 0] or pos[1] != self._known[slot, 1]:
+            self._xy[slot] = self._known[slot] = pos
+        self._size[slot] = sprite.size
+        self._draw_images = None
+
+    def set_z(self, sprite: Sprite, z: float) -> None:
+        """Modify the depth of a sprite, the draw order is sorted again before the next draw."""
+        slot = self._slots[sprite]
+        if self._z[slot] != z:
+            self._z[slot] = z
+            self._order = None
+
+    def get_z(self, sprite: Sprite) -> float:
+        """Return the depth of a sprite."""
+        return float(self._z[self._slots[sprite]])
+
+    def move(self, dx: Union[float, numpy.ndarray], dy: Union[float, numpy.ndarray],
+             sprites: Optional[Sequence[Sprite]] = None) -> None:
+        """Move every sprite of the group, or only the given sprites, by dx and dy, scalars or arrays."""
+        count = len(self._sprites)
+        if sprites is None:
+            self._xy[:count, 0] += dx
+            self._xy[:count, 1] += dy
+        else:
+            slots = numpy.fromiter((self._slots[sprite] for sprite in sprites), dtype=numpy.intp, count=len(sprites))
+            self._xy[slots, 0] += dx
+            self._xy[slots, 1] += dy
+        self._synced = False
+
+    def _sync(self, slot: int) -> None:
+        """Write the position of a column back to its sprite."""
+        self._syncing = True
+        self._known[slot] = self._xy[slot]
+        self._sprites[slot].pos = tuple(self._xy[slot].tolist())
+        self._syncing = False
+
+    def sync(self) -> None:
+        """Write the positions of the columns back to the sprites, after moves."""
+        if self._synced:
+            return
+        self._syncing = True
+        count = len(self._sprites)
+        self._known[:count] = self._xy[:count]
+        for (sprite, pos) in zip(self._sprites, self._xy[:count].tolist()):
+            sprite.pos = tuple(pos)
+        self._syncing = False
+        self._synced = True
+
+    def _sort(self) -> None:
+        """Sort the draw order by z, the sprites with the same z keep the order they were added."""
+        self._order = numpy.argsort(self._z[:len(self._sprites)], kind='stable')
+        self._draw_images = None
+
+    def draw(self, surface: pygame.Surface) -> None:
+        """
+        Blit every sprite of the group on the surface with one call, from the lowest to the highest z.
+        -----------------------------------------------------------------------------------------------
+        The images are collected again only after a sprite changed, the stale ones are rendered then.
+        """
+        if self._order is None:
+            self._sort()
+        if self._draw_images is None:
+            sprites = self._sprites
+            self._draw_images = [sprites[slot].image for slot in self._order.tolist()]
+        positions = self._xy[self._order].tolist()
+        surface.blits(zip(self._draw_images, positions), doreturn=False)
+
+    @property
+    def sprites(self) -> List[Sprite]:
+        """Return the sprites of the group."""
+        return list(self._sprites)
+
+    @property
+    def positions(self) -> numpy.ndarray:
+        """Return the column of the sprites positions, a view which can be modified in place before a sync."""
+        self._synced = False
+        return self._xy[:len(self._sprites)]
+
+    @property
+    def sizes(self) -> numpy.ndarray:
+        """Return a copy of the column of the sprites sizes."""
+        return self._size[:len(self._sprites)].copy()
+
+    @property
+    def depths(self) -> numpy.ndarray:
+        """Return a copy of the column of the sprites depths."""
+        return self._z[:len(self._sprites)].copy()
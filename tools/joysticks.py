@@ -0,0 +1,297 @@
+# coding: utf-8
+
+import time
+from typing import Dict, List, Optional
+
+import numpy
+import pygame
+import pygame.locals as pg
+
+from tools import decorators
+from tools.softwares import KEY_DOWN, KEY_UP
+
+MAX_BUTTONS = 32
+MAX_AXES = 8
+MAX_HATS = 4
+MAX_BALLS = 4
+
+
+@decorators.singleton(parameters=False)
+class JoystickManager(object):
+    """
+    Simulate every joystick software at once.
+    -----------------------------------------
+    The joystick events are routed to their pad by instance id, the pads are connected and disconnected
+    with the JOYDEVICEADDED and JOYDEVICEREMOVED events, without initializing the joystick module again.
+    The state of the buttons, axes, hats and balls of every pad is stored in NumPy arrays, one row per pad,
+    and the deadzone is applied to every axis at once, at the end of the frames which moved an axis.
+    """
+
+    def __init__(self, max_pads: int = 8, deadzone: float = 0.1) -> None:
+        """Create the joystick manager for the first time."""
+        self._max_pads = max_pads
+        self._deadzone = deadzone
+        self._joysticks = {}
+        self._pads = {}
+        self._names = {}
+        self._free = list(range(max_pads - 1, -1, -1))
+        self._button_state = numpy.zeros((max_pads, MAX_BUTTONS), dtype=numpy.uint8)
+        self._button_first = numpy.zeros((max_pads, MAX_BUTTONS), dtype=numpy.bool_)
+        self._button_time = numpy.zeros((max_pads, MAX_BUTTONS), dtype=numpy.float64)
+        self._raw_axes = numpy.zeros((max_pads, MAX_AXES), dtype=numpy.float32)
+        self._axes = numpy.zeros((max_pads, MAX_AXES), dtype=numpy.float32)
+        self._axis_first = numpy.zeros((max_pads, MAX_AXES), dtype=numpy.bool_)
+        self._axis_time = numpy.zeros((max_pads, MAX_AXES), dtype=numpy.float64)
+        self._axis_moved = numpy.zeros((max_pads, MAX_AXES), dtype=numpy.bool_)
+        self._hats = numpy.zeros((max_pads, MAX_HATS, 2), dtype=numpy.int8)
+        self._hat_first = numpy.zeros((max_pads, MAX_HATS), dtype=numpy.bool_)
+        self._hat_time = numpy.zeros((max_pads, MAX_HATS), dtype=numpy.float64)
+        self._hat_moved = numpy.zeros((max_pads, MAX_HATS), dtype=numpy.bool_)
+        self._balls = numpy.zeros((max_pads, MAX_BALLS, 2), dtype=numpy.int32)
+        self._axes_moved = False
+        self._now = time.time()
+        self.handlers = {pg.JOYDEVICEADDED: self._joydeviceadded, pg.JOYDEVICEREMOVED: self._joydeviceremoved,
+                         pg.JOYBUTTONDOWN: self._joybuttondown, pg.JOYBUTTONUP: self._joybuttonup,
+                         pg.JOYAXISMOTION: self._joyaxismotion, pg.JOYHATMOTION: self._joyhatmotion,
+                         pg.JOYBALLMOTION: self._joyballmotion}
+        self.reset_joysticks()
+
+    def reset_joysticks(self) -> None:
+        """Initialize the joystick module if it is not, and connect the pads already plugged."""
+        if not pygame.joystick.get_init():
+            pygame.joystick.init()
+        for device_index in range(pygame.joystick.get_count()):
+            self._open(device_index)
+
+    def _open(self, device_index: int) -> None:
+        """Open the joystick of a device and connect its pad, if it is not."""
+        joystick = pygame.joystick.Joystick(device_index)
+        instance_id = joystick.get_instance_id()
+        if instance_id in self._pads:
+            return
+        if self.connect(instance_id, joystick.get_name()) is None:
+            # Every pad is taken
+            joystick.quit()
+            return
+        self._joysticks[instance_id] = joystick
+
+    def connect(self, instance_id: int, name: str = "") -> Optional[int]:
+        """Give a pad to a joystick instance id, return the pad, None if every pad is taken."""
+        if instance_id in self._pads:
+            return self._pads[instance_id]
+        if not self._free:
+            return None
+        pad = self._free.pop()
+        self._pads[instance_id] = pad
+        self._names[pad] = name
+        self.reset_pad(pad)
+        return pad
+
+    def disconnect(self, instance_id: int) -> None:
+        """Free the pad of a joystick instance id."""
+        pad = self._pads.pop(instance_id, None)
+        self._joysticks.pop(instance_id, None)
+        if pad is not None:
+            del self._names[pad]
+            self.reset_pad(pad)
+            self._free.append(pad)
+
+    def reset_pad(self, pad: int) -> None:
+        """Forget the state of a pad."""
+        for array_ in (self._button_state, self._button_first, self._button_time, self._raw_axes, self._axes,
+                       self._axis_first, self._axis_time, self._axis_moved, self._hats, self._hat_first,
+                       self._hat_time, self._hat_moved, self._balls):
+            array_[pad] = 0
+
+    def update(self, events: List[pygame.event.EventType]) -> None:
+        """Update events for the joysticks."""
+        self.begin_frame()
+        handlers = self.handlers
+        for event in events:
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+        self.end_frame()
+
+    def begin_frame(self, now: Optional[float] = None) -> None:
+        """Forget the ball motions of the previous frame and take the time of the frame, now or the current time."""
+        self._now = time.time() if now is None else now
+        self._balls.fill(0)
+
+    def end_frame(self) -> None:
+        """Apply the deadzone to every axis, if an axis moved during the frame."""
+        if self._axes_moved:
+            self._axes_moved = False
+            self.reset_axes()
+
+    def reset_axes(self) -> None:
+        """Apply the deadzone to every axis at once, the values out of it are scaled back to [-1, 1]."""
+        deadzone = self._deadzone
+        magnitude = numpy.abs(self._raw_axes)
+        scaled = (magnitude - deadzone) / max(1.0 - deadzone, 1e-6)
+        numpy.copysign(numpy.clip(scaled, 0.0, 1.0), self._raw_axes, out=self._axes)
+
+    def _joydeviceadded(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYDEVICEADDED events."""
+        self._open(event.device_index)
+
+    def _joydeviceremoved(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYDEVICEREMOVED events."""
+        self.disconnect(event.instance_id)
+
+    def _joybuttondown(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBUTTONDOWN events."""
+        pad = self._pads.get(event.instance_id)
+        if pad is not None and event.button < MAX_BUTTONS:
+            self._button_state[pad, event.button] = KEY_DOWN
+            self._button_first[pad, event.button] = True
+
+    def _joybuttonup(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBUTTONUP events."""
+        pad = self._pads.get(event.instance_id)
+        if pad is not None and event.button < MAX_BUTTONS:
+            self._button_state[pad, event.button] = KEY_UP
+
+    def _joyaxismotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYAXISMOTION events."""
+        pad = self._pads.get(event.instance_id)
+        if pad is not None and event.axis < MAX_AXES:
+            # -1 <= event.value <= 1
+            self._raw_axes[pad, event.axis] = event.value
+            self._axis_first[pad, event.axis] = True
+            self._axis_moved[pad, event.axis] = True
+            self._axes_moved = True
+
+    def _joyhatmotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYHATMOTION events."""
+        pad = self._pads.get(event.instance_id)
+        if pad is not None and event.hat < MAX_HATS:
+            # (-1, -1) <= event.value <= (1, 1)
+            self._hats[pad, event.hat] = event.value
+            self._hat_first[pad, event.hat] = True
+            self._hat_moved[pad, event.hat] = True
+
+    def _joyballmotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBALLMOTION events, the motions of a frame are added."""
+        pad = self._pads.get(event.instance_id)
+        if pad is not None and event.ball < MAX_BALLS:
+            self._balls[pad, event.ball] += event.rel
+
+    def _push(self, first: numpy.ndarray, times: numpy.ndarray, index: tuple, active: bool,
+              delay: float) -> bool:
+        """Know if an input is pushed: the first frame it changed, then every delay while it is active."""
+        if first[index]:
+            first[index] = False
+            times[index] = self._now
+            return True
+        if active and self._now - times[index] >= delay:
+            times[index] = self._now
+            return True
+        return False
+
+    def _check(self, pad: int, index: int, count: int, control: str) -> None:
+        """Raise an IndexError if the pad or the control index is out of range."""
+        if not 0 <= pad < self._max_pads:
+            raise IndexError("pad {} out of range, there are {} pads".format(pad, self._max_pads))
+        if not 0 <= index < count:
+            raise IndexError("{} {} out of range, a pad has {} of them".format(control, index, count))
+
+    def push_button(self, pad: int, button: int, delay: float = 0) -> Optional[bool]:
+        """Know if a button of a pad is pushed, depends on delay. Return None if the button never changed."""
+        self._check(pad, button, MAX_BUTTONS, 'button')
+        if self._button_state[pad, button] == 0:
+            return None
+        return self._push(self._button_first, self._button_time, (pad, button),
+                          self._button_state[pad, button] == KEY_DOWN, delay)
+
+    def push_axis(self, pad: int, axis: int, delay: float = 0) -> Optional[bool]:
+        """Know if an axis of a pad is pushed out of the deadzone, depends on delay. Return None if it never moved."""
+        self._check(pad, axis, MAX_AXES, 'axis')
+        if not self._axis_moved[pad, axis]:
+            return None
+        if self._axes_moved:
+            self.end_frame()
+        return self._push(self._axis_first, self._axis_time, (pad, axis), self._axes[pad, axis] != 0, delay)
+
+    def push_hat(self, pad: int, hat: int, delay: float = 0) -> Optional[bool]:
+        """Know if a hat of a pad is pushed, depends on delay. Return None if the hat never moved."""
+        self._check(pad, hat, MAX_HATS, 'hat')
+        if not self._hat_moved[pad, hat]:
+            return None
+        return self._push(self._hat_first, self._hat_time, (pad, hat), bool(self._hats[pad, hat].any()), delay)
+
+    def get_axis(self, pad: int, axis: int) -> float:
+        """Return the current value of an axis of a pad, the deadzone applied."""
+        self._check(pad, axis, MAX_AXES, 'axis')
+        if self._axes_moved:
+            self.end_frame()
+        return float(self._axes[pad, axis])
+
+    def get_hat(self, pad: int, hat: int) -> (int, int):
+        """Return the current value of a hat of a pad."""
+        self._check(pad, hat, MAX_HATS, 'hat')
+        (x, y) = self._hats[pad, hat].tolist()
+        return (x, y)
+
+    def get_ball(self, pad: int, ball: int) -> (int, int):
+        """Return the motion of a ball of a pad during the frame."""
+        self._check(pad, ball, MAX_BALLS, 'ball')
+        (x, y) = self._balls[pad, ball].tolist()
+        return (x, y)
+
+    def pad(self, instance_id: int) -> Optional[int]:
+        """Return the pad of a joystick instance id, None if it is not connected."""
+        return self._pads.get(instance_id)
+
+    def name(self, pad: int) -> str:
+        """Return the name of the joystick of a pad."""
+        return self._names.get(pad, "")
+
+    @property
+    def pads(self) -> List[int]:
+        """Return the connected pads."""
+        return sorted(self._pads.values())
+
+    @property
+    def instance_ids(self) -> Dict[int, int]:
+        """Return the pads of the connected joysticks, keyed on their instance id."""
+        return dict(self._pads)
+
+    @property
+    def buttons(self) -> numpy.ndarray:
+        """Return which buttons are held, one row per pad, a read-only view."""
+        held = self._button_state == KEY_DOWN
+        held.flags.writeable = False
+        return held
+
+    @property
+    def axes(self) -> numpy.ndarray:
+        """Return the values of the axes, the deadzone applied, one row per pad, a read-only view."""
+        if self._axes_moved:
+            self.end_frame()
+        axes = self._axes.view()
+        axes.flags.writeable = False
+        return axes
+
+    @property
+    def hats(self) -> numpy.ndarray:
+        """Return the values of the hats, one row per pad, a read-only view."""
+        hats = self._hats.view()
+        hats.flags.writeable = False
+        return hats
+
+    @property
+    def deadzone(self) -> float:
+        """Return the current deadzone of the axes."""
+        return self._deadzone
+
+    @deadzone.setter
+    def deadzone(self, value: float) -> None:
+        """Modify the deadzone of the axes."""
+        self._deadzone = value
+        self.reset_axes()
+
+    @property
+    def max_pads(self) -> int:
+        """Return the maximum number of connected pads."""
+        return self._max_pads
@@ -0,0 +1,250 @@
+# coding: utf-8
+
+from typing import Iterator, List, Optional, Tuple
+
+import pygame
+import pygame.locals as pg
+
+from tools.sprites import Sprite
+
+
+class Node(object):
+    """
+    Place a sprite and child nodes relatively to a parent node, in a retained scene graph.
+    --------------------------------------------------------------------------------------
+    The world position and the world area of every node are cached, and forgotten only when a node moves
+    or a sprite of its subtree changes, the node watches its sprite for that.
+    A static node flattens its subtree into one layer surface, composed again only when a sprite of the subtree
+    changed, so a static panel costs one blit per frame however many sprites it holds.
+    An opaque static node has no per-pixel alpha, its first sprite must cover its whole area.
+    Usage:
+    > hud = Node(pos=(10, 10), static=True, children=[Node(Text(message="SCORE")), Node(Text(message="0"), (0, 90))])
+    > hud.blit_on(screen.image)
+    """
+
+    def __init__(self, sprite: Optional[Sprite] = None, pos: Optional[Tuple[float, float]] = None,
+                 static: bool = False, opaque: bool = False, children: Optional[List['Node']] = None) -> None:
+        """Create the node for the first time, at the position of its sprite if pos is None."""
+        self._parent = None
+        self._children = []
+        self._sprite = None
+        self._pos = pos if pos is not None else (sprite.pos if sprite is not None else (0, 0))
+        self._world_pos = None
+        self._area = None
+        self._previous_area = None
+        self._dirty = True
+        self._static = static
+        self._opaque = opaque
+        self._layer = None
+        self._stale = True
+        self.compositions = 0
+        self.sprite = sprite
+        for child in children or ():
+            self.add(child)
+
+    # MANAGE TREE
+
+    def add(self, child: 'Node') -> None:
+        """Add a child node, drawn after the sprite of the node and the previous children."""
+        if child._parent is not None:
+            child._parent.remove(child)
+        child._parent = self
+        self._children.append(child)
+        child._moved()
+
+    def remove(self, child: 'Node') -> None:
+        """Remove a child node, it keeps its sprite."""
+        self._children.remove(child)
+        child._parent = None
+        child._moved()
+        self._changed()
+
+    def release(self) -> None:
+        """Stop watching the sprites of the subtree, before the nodes are dropped."""
+        if self._sprite is not None:
+            self._sprite.unwatch(self._sprite_changed)
+        for child in self._children:
+            child.release()
+
+    def nodes(self) -> Iterator['Node']:
+        """Iterate over the nodes of the subtree, in drawing order."""
+        yield self
+        for child in self._children:
+            yield from child.nodes()
+
+    def sprites(self) -> Iterator[Sprite]:
+        """Iterate over the sprites of the subtree, in drawing order."""
+        for node in self.nodes():
+            if node._sprite is not None:
+                yield node._sprite
+
+    # MANAGE CACHES
+
+    def _moved(self) -> None:
+        """Forget the world positions of the subtree, and move its sprites to their new world positions."""
+        self._world_pos = None
+        if self._sprite is not None and self._sprite.pos != self.world_pos:
+            self._sprite.pos = self.world_pos
+        for child in self._children:
+            child._moved()
+        self._changed()
+
+    def _changed(self) -> None:
+        """Forget the world areas of the node and its ancestors, and mark their layers stale."""
+        node = self
+        while node is not None:
+            node._area = None
+            node._dirty = True
+            if node._static:
+                node._stale = True
+            node = node._parent
+
+    def _sprite_changed(self, sprite: Sprite) -> None:
+        """Manage the sprite changes. Called by the sprite, a sprite moved by itself moves the node."""
+        world_pos = self.world_pos
+        if sprite.pos != world_pos:
+            (x, y) = self._pos
+            self._pos = (x + sprite.x - world_pos[0], y + sprite.y - world_pos[1])
+            self._world_pos = sprite.pos
+            for child in self._children:
+                child._moved()
+        self._changed()
+
+    @property
+    def world_pos(self) -> (float, float):
+        """Return the position of the node on the screen, cached."""
+        if self._world_pos is None:
+            if self._parent is None:
+                self._world_pos = self._pos
+            else:
+                (x, y) = self._parent.world_pos
+                self._world_pos = (x + self._pos[0], y + self._pos[1])
+        return self._world_pos
+
+    @property
+    def area(self) -> pygame.Rect:
+        """Return the area of the subtree on the screen, cached."""
+        if self._area is None:
+            areas = [child.area for child in self._children]
+            if self._sprite is not None:
+                areas.insert(0, self._sprite.area)
+            areas = [area for area in areas if area.width and area.height]
+            if areas:
+                self._area = areas[0].unionall(areas[1:])
+            else:
+                self._area = pygame.Rect(self.world_pos, (0, 0))
+        return self._area
+
+    # MANAGE LAYER
+
+    def compose(self) -> pygame.Surface:
+        """Flatten the subtree into the layer surface, return it."""
+        area = self.area
+        if self._layer is None or self._layer.get_size() != area.size:
+            if self._opaque:
+                self._layer = pygame.Surface(area.size)
+            else:
+                self._layer = pygame.Surface(area.size, pg.SRCALPHA)
+            if pygame.display.get_surface() is not None:
+                self._layer = self._layer.convert() if self._opaque else self._layer.convert_alpha()
+        if not self._opaque:
+            self._layer.fill((0, 0, 0, 0))
+        self._draw(self._layer, (-area.x, -area.y), True)
+        self._stale = False
+        self.compositions += 1
+        return self._layer
+
+    def _draw(self, surface: pygame.Surface, offset: (int, int), composing: bool = False) -> None:
+        """Draw the subtree onto the surface, the static subtrees as their layer."""
+        (x, y) = offset
+        if self._static and not composing:
+            layer = self.compose() if self._stale else self._layer
+            surface.blit(layer, self.area.move(x, y))
+            return
+        if self._sprite is not None:
+            surface.blit(self._sprite.image, self._sprite.area.move(x, y))
+        for child in self._children:
+            child._draw(surface, offset)
+
+    def blit_on(self, surface: pygame.Surface) -> List[pygame.Rect]:
+        """
+        Blit the subtree onto the surface, a static subtree in one blit.
+        -----------------------------------------------------------------
+        The sprites of the subtree are displayed then, they are not dirty anymore.
+        Return the list of the surface areas which changed.
+        """
+        self._draw(surface, (0, 0))
+        if self._dirty:
+            for sprite in self.sprites():
+                sprite._dirty = False
+                sprite._previous_area = sprite.area.copy()
+        self._dirty = False
+        self._previous_area = self.area.copy()
+        return [self._previous_area]
+
+    def dirty_areas(self) -> List[pygame.Rect]:
+        """Return the areas to display again since the last blit, the previous and the current one."""
+        if self._previous_area is None or self._previous_area == self.area:
+            return [self.area]
+        return [self._previous_area, self.area]
+
+    # MANAGE PROPERTIES
+
+    @property
+    def sprite(self) -> Optional[Sprite]:
+        """Return the current sprite of the node."""
+        return self._sprite
+
+    @sprite.setter
+    def sprite(self, value: Optional[Sprite]) -> None:
+        """Modify the sprite of the node, it is moved to the node position and watched."""
+        if self._sprite is not None:
+            self._sprite.unwatch(self._sprite_changed)
+        self._sprite = value
+        if value is not None:
+            value.watch(self._sprite_changed)
+        self._moved()
+
+    @property
+    def pos(self) -> (float, float):
+        """Return the current position of the node, relatively to its parent."""
+        return self._pos
+
+    @pos.setter
+    def pos(self, value: (float, float)) -> None:
+        """Modify the position of the node, relatively to its parent."""
+        self._pos = value
+        self._moved()
+
+    @property
+    def parent(self) -> Optional['Node']:
+        """Return the parent node, None for a root."""
+        return self._parent
+
+    @property
+    def children(self) -> List['Node']:
+        """Return the child nodes."""
+        return list(self._children)
+
+    @property
+    def static(self) -> bool:
+        """Return True if the subtree is flattened into a layer, False otherwise."""
+        return self._static
+
+    @static.setter
+    def static(self, value: bool) -> None:
+        """Flatten the subtree into a layer, or draw its sprites one by one."""
+        self._static = value
+        self._stale = True
+        if not value:
+            self._layer = None
+
+    @property
+    def stale(self) -> bool:
+        """Return True if the layer must be composed again, False otherwise."""
+        return self._static and self._stale
+
+    @property
+    def dirty(self) -> bool:
+        """Return True if the subtree changed since the last blit, False otherwise."""
+        return self._dirty
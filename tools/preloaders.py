@@ -0,0 +1,194 @@
+# coding: utf-8
+
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import pygame
+
+from tools.assets import AssetManager
+from tools.sprites import Font, RenderCache
+
+FONT = 'font'
+TEXT = 'text'
+IMAGE = 'image'
+
+
+class Preloader(object):
+    """
+    Decode the images of a manifest on a pool of worker threads, read its fonts and render its texts meanwhile.
+    -----------------------------------------------------------------------------------------------------------
+    The workers hand their images back through a thread-safe queue, poll() is called on the main thread
+    every frame to move them into the asset manager, and to read a few fonts and render a few texts
+    into the font registry and the render cache, so a loading screen keeps animating while the files are read.
+    The fonts stay on the main thread: FreeType does not allow to open fonts on several threads at once.
+    The preloaded fonts are kept alive as long as the preloader.
+    Manifest:
+    > {'fonts': [(None, 48)],
+    >  'texts': [{'message': "PLAY", 'font_size': 84, 'message_color': (0, 0, 0)}],
+    >  'images': ["images/background.png", ("images/player.png", True)]}
+    """
+
+    def __init__(self, manifest: Optional[dict] = None, workers: int = 4) -> None:
+        """Create the preloader for the first time."""
+        self._workers = workers
+        self._entries = []
+        self._executor = None
+        self._results = queue.Queue()
+        self._pending = deque()
+        self._fonts = set()
+        self.completed = 0
+        self.errors = []
+        if manifest is not None:
+            self.add_manifest(manifest)
+
+    def add_manifest(self, manifest: dict) -> None:
+        """Add every font, text and image of a manifest."""
+        for font in manifest.get('fonts', ()):
+            self.add_font(*font)
+        for text in manifest.get('texts', ()):
+            self.add_text(**text)
+        for image in manifest.get('images', ()):
+            if isinstance(image, str):
+                self.add_image(image)
+            else:
+                self.add_image(*image)
+
+    def add_font(self, font_filename: Optional[str] = None, font_size: int = 84) -> None:
+        """Add a font to preload."""
+        self._add((FONT, (font_filename, font_size)))
+
+    def add_text(self, message: str = "PYGAME", font_filename: Optional[str] = None, font_size: int = 84,
+                 antialias: bool = True, message_color: (int, int, int) = (0, 0, 0),
+                 background_color: Optional[Tuple[int, int, int]] = None) -> None:
+        """Add a text to render, with the same arguments as a Text."""
+        self._add((TEXT, (font_filename, font_size, message, antialias, tuple(message_color),
+                          tuple(background_color) if background_color is not None else None)))
+
+    def add_image(self, filename: str, alpha: Optional[bool] = None) -> None:
+        """Add an image to decode, with the same arguments as an Image."""
+        self._add((IMAGE, (filename, alpha)))
+
+    def _add(self, entry: tuple) -> None:
+        """Add an entry, submit it at once if the preloader is started."""
+        self._entries.append(entry)
+        if self._executor is not None:
+            self._submit(entry)
+
+    def start(self) -> None:
+        """Start preloading every entry on the workers."""
+        if self._executor is not None:
+            return
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='preloader')
+        for entry in self._entries:
+            self._submit(entry)
+
+    def _submit(self, entry: tuple) -> None:
+        """Give an image to the workers, its result is queued when it is done, keep the other entries for poll()."""
+        if entry[0] != IMAGE:
+            self._pending.append(entry)
+            return
+        future = self._executor.submit(self._work, entry)
+        future.add_done_callback(lambda future_: self._results.put((entry, future_)))
+
+    @staticmethod
+    def _work(entry: tuple) -> Tuple[pygame.Surface, float]:
+        """Decode an image on a worker, return it and the time spent."""
+        start = time.perf_counter()
+        result = pygame.image.load(entry[1][0])
+        return (result, time.perf_counter() - start)
+
+    def _load(self, entry: tuple) -> None:
+        """Read the font of an entry and render its text on the main thread, or keep its error."""
+        self.completed += 1
+        (kind, arguments) = entry
+        try:
+            font = Font(*arguments[:2])
+            self._fonts.add(font)
+            if kind == TEXT:
+                (font_filename, font_size, message, antialias, color, background) = arguments
+                RenderCache().render(font, message, antialias, color, background)
+        except Exception as exception:
+            self.errors.append((entry, exception))
+
+    def poll(self, budget: float = 0.004) -> int:
+        """
+        Move the decoded images to the asset manager, then read fonts and render texts. Called every frame.
+        ---------------------------------------------------------------------------------------------------
+        Stop after budget seconds, return the number of entries moved to their cache.
+        """
+        deadline = time.perf_counter() + budget
+        count = 0
+        while True:
+            try:
+                (entry, future) = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(entry, future)
+            count += 1
+            if time.perf_counter() >= deadline:
+                return count
+        while self._pending and time.perf_counter() < deadline:
+            self._load(self._pending.popleft())
+            count += 1
+        return count
+
+    def _finish(self, entry: tuple, future: Future) -> None:
+        """Move the decoded image of an entry to the asset manager, or keep its error."""
+        self.completed += 1
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            self.errors.append((entry, exception))
+            return
+        (filename, alpha) = entry[1]
+        (result, load_time) = future.result()
+        AssetManager().store(filename, result, alpha, load_time)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every entry is moved to its cache, return False if timeout seconds passed before."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.done:
+            if self._pending:
+                self._load(self._pending.popleft())
+                continue
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                (entry, future) = self._results.get(timeout=remaining)
+            except queue.Empty:
+                return False
+            self._finish(entry, future)
+        return True
+
+    def shutdown(self) -> None:
+        """Stop the workers, the entries not started yet are cancelled."""
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def total(self) -> int:
+        """Return the number of entries to preload."""
+        return len(self._entries)
+
+    @property
+    def progress(self) -> float:
+        """Return the part of the entries moved to their cache, between 0 and 1."""
+        return self.completed / len(self._entries) if self._entries else 1.0
+
+    @property
+    def done(self) -> bool:
+        """Return True if every entry is moved to its cache, False otherwise."""
+        return self.completed >= len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """Return the progress of the preloader."""
+        return {'total': self.total, 'completed': self.completed, 'errors': len(self.errors),
+                'progress': self.progress}
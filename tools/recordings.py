@@ -0,0 +1,234 @@
+# coding: utf-8
+
+"""
+Record the events seen by the softwares, and play them back deterministically.
+------------------------------------------------------------------------------
+Layout of a recording file, little endian:
+- the header: magic and version,
+- the frames: frame number, frame time and number of events,
+- after every frame, its events: type, length of the attributes and the attributes marshalled.
+The frame times are played back as the times of the frames, so the delays of the push() methods
+and the timers of the clock repeat exactly.
+Usage:
+> with Recorder("session.rec"):
+>     menu.loop()
+>
+> with Player("session.rec", realtime=False):
+>     menu.loop()
+"""
+
+import marshal
+import struct
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import pygame
+import pygame.locals as pg
+
+from tools.softwares import Clock, EventBus
+
+MAGIC = b'PGIR'
+VERSION = 1
+
+# MAGIC, VERSION
+HEADER = struct.Struct('<4sH')
+# FRAME NUMBER, FRAME TIME, EVENTS COUNT
+FRAME = struct.Struct('<IdH')
+# EVENT TYPE, ATTRIBUTES LENGTH
+EVENT = struct.Struct('<IH')
+
+MARSHALLABLE = (bool, int, float, str, bytes, tuple, type(None))
+
+
+def encode(event: pygame.event.EventType) -> bytes:
+    """Return an event packed, its attributes which can not be marshalled are left out, like the window."""
+    attributes = {name: value for (name, value) in event.dict.items() if isinstance(value, MARSHALLABLE)}
+    data = marshal.dumps(attributes)
+    return EVENT.pack(event.type, len(data)) + data
+
+
+def read_frames(file: BinaryIO) -> Iterator[Tuple[int, float, List[pygame.event.EventType]]]:
+    """Return the frame number, the frame time and the events of every frame of a recording file."""
+    (magic, version) = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("{} is not a recording file.".format(file.name))
+    if version > VERSION:
+        raise ValueError("{} has the version {}, only {} is known.".format(file.name, version, VERSION))
+    while True:
+        data = file.read(FRAME.size)
+        if len(data) < FRAME.size:
+            return
+        (frame, time_, count) = FRAME.unpack(data)
+        events = []
+        for _ in range(count):
+            (type_, length) = EVENT.unpack(file.read(EVENT.size))
+            events.append(pygame.event.Event(type_, marshal.loads(file.read(length))))
+        yield (frame, time_, events)
+
+
+class Recorder(object):
+    """Write the frames of the event bus in a recording file, their times and the events dispatched."""
+
+    def __init__(self, filename: str, bus: Optional[EventBus] = None) -> None:
+        """Create the recorder for the first time."""
+        self._filename = filename
+        self._bus = bus if bus is not None else EventBus()
+        self._file = None
+        self._first = None
+        self.frames = 0
+        self.events = 0
+
+    def __enter__(self) -> 'Recorder':
+        """Start recording in a with statement."""
+        self.start()
+        return self
+
+    def __exit__(self, *exception: object) -> None:
+        """Stop recording at the end of a with statement."""
+        self.stop()
+
+    def start(self) -> None:
+        """Open the recording file and record every frame of the event bus."""
+        if self._file is not None:
+            return
+        self._file = open(self._filename, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._first = None
+        self._bus.tap(self.record)
+
+    def record(self, frame: int, now: float, events: List[pygame.event.EventType]) -> None:
+        """Write a frame. Called by the event bus before it dispatches the events."""
+        if self._first is None:
+            self._first = frame
+        data = [FRAME.pack(frame - self._first, now, len(events))]
+        data.extend([encode(event) for event in events])
+        self._file.write(b''.join(data))
+        self.frames += 1
+        self.events += len(events)
+
+    def stop(self) -> None:
+        """Stop recording and close the recording file."""
+        if self._file is None:
+            return
+        self._bus.untap(self.record)
+        self._file.close()
+        self._file = None
+
+    @property
+    def recording(self) -> bool:
+        """Return True if the frames are recorded, False otherwise."""
+        return self._file is not None
+
+
+class Player(object):
+    """
+    Feed the event bus with the frames of a recording file in place of the pygame events.
+    --------------------------------------------------------------------------------------
+    In real time, every frame waits until as much time passed as during the recording.
+    Otherwise, the clock is uncapped and the idle waits return at once, the recording is played as fast as possible.
+    A QUIT event is added after the last frame if quit_at_end is True, the pygame events are used again then.
+    """
+
+    def __init__(self, filename: str, realtime: bool = False, quit_at_end: bool = True,
+                 bus: Optional[EventBus] = None, clock: Optional[Clock] = None) -> None:
+        """Create the player for the first time."""
+        with open(filename, 'rb') as file:
+            self._frames = list(read_frames(file))
+        self._bus = bus if bus is not None else EventBus()
+        self._clock = clock if clock is not None else Clock()
+        self._realtime = realtime
+        self._quit_at_end = quit_at_end
+        self._cursor = 0
+        self._start = None
+        self._uncapped = False
+        self._now = time.time
+        self._playing = False
+
+    def __enter__(self) -> 'Player':
+        """Start playing in a with statement."""
+        self.start()
+        return self
+
+    def __exit__(self, *exception: object) -> None:
+        """Stop playing at the end of a with statement."""
+        self.stop()
+
+    def start(self) -> None:
+        """Replace the events and the time of the event bus by the ones of the recording."""
+        if self._playing:
+            return
+        self._playing = True
+        self._cursor = 0
+        self._start = time.perf_counter()
+        self._bus.source = self
+        self._bus.clock = self.time
+        self._uncapped = self._clock.uncapped
+        self._clock.uncapped = not self._realtime
+        self._now = self._clock.now
+        self._clock.now = self.now
+
+    def stop(self) -> None:
+        """Give the events and the time of the event bus back to pygame."""
+        if not self._playing:
+            return
+        self._playing = False
+        if self._bus.source is self:
+            self._bus.source = None
+            self._bus.clock = time.time
+        self._clock.uncapped = self._uncapped
+        self._clock.now = self._now
+
+    def _offset(self, cursor: int) -> float:
+        """Return the time of a frame since the first frame of the recording."""
+        return self._frames[cursor][1] - self._frames[0][1]
+
+    def time(self) -> float:
+        """Return the time of the next frame, in real time wait for it first. Called by the event bus."""
+        if self._cursor >= len(self._frames):
+            return time.time()
+        if self._realtime:
+            delay = self._offset(self._cursor) - (time.perf_counter() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+        return self._frames[self._cursor][1]
+
+    def now(self) -> float:
+        """Return the time of the frame played, so the timers of the clock run at the recorded times."""
+        return self._bus.time
+
+    def get(self) -> List[pygame.event.EventType]:
+        """Return the events of the next frame. Called by the event bus in place of pygame.event.get()."""
+        if pygame.display.get_init():
+            pygame.event.pump()
+        if self._cursor >= len(self._frames):
+            self.stop()
+            return [pygame.event.Event(pg.QUIT)] if self._quit_at_end else []
+        events = self._frames[self._cursor][2]
+        self._cursor += 1
+        return list(events)
+
+    def wait(self, timeout: int) -> bool:
+        """Return at once, in real time sleep until the next frame or timeout. Called by the event bus."""
+        if self._realtime and self._cursor < len(self._frames):
+            delay = self._offset(self._cursor) - (time.perf_counter() - self._start)
+            time.sleep(max(0.0, min(delay, timeout / 1000)))
+        return True
+
+    def __len__(self) -> int:
+        """Return the number of frames of the recording."""
+        return len(self._frames)
+
+    @property
+    def frame(self) -> int:
+        """Return the number of the next frame to play."""
+        return self._cursor
+
+    @property
+    def done(self) -> bool:
+        """Return True if every frame is played, False otherwise."""
+        return self._cursor >= len(self._frames)
+
+    @property
+    def playing(self) -> bool:
+        """Return True if the recording feeds the event bus, False otherwise."""
+        return self._playing
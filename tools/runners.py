@@ -0,0 +1,94 @@
+# coding: utf-8
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Set
+
+from tools import decorators
+
+
+@decorators.singleton(parameters=False)
+class Runner(object):
+    """
+    Run the game loop in asyncio, and the blocking work beside it, using the singleton decorator.
+    ---------------------------------------------------------------------------------------------
+    The blocking work, like writing or reading a file, is offloaded to a pool of worker threads and awaited,
+    the frames keep going while it runs. The sprites must be rendered on the main thread, before offloading.
+    The actions started without a running event loop run to the end at once.
+    Usage:
+    > async def autosave():
+    >     chunks = saves.pack(sprites)
+    >     await Runner().offload(saves.write, "autosave.scene", chunks)
+    > Runner().start(autosave())
+    > Runner().run(menu.loop_async())
+    """
+
+    def __init__(self, workers: int = 2) -> None:
+        """Create the runner for the first time."""
+        self._workers = workers
+        self._executor = None
+        self._tasks = set()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the pool of worker threads, create it the first time."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='runner')
+        return self._executor
+
+    async def offload(self, function: Callable[..., object], *arguments: object, **keywords: object) -> object:
+        """Call a blocking function on a worker thread, return its result once it is done."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *arguments, **keywords))
+
+    def start(self, awaitable: Awaitable) -> Optional[asyncio.Task]:
+        """
+        Run an awaitable as a task alongside the frames, return the task.
+        ------------------------------------------------------------------
+        Without a running event loop, the awaitable runs to the end at once and None is returned.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self._wrap(awaitable))
+            return None
+        task = loop.create_task(self._wrap(awaitable))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @staticmethod
+    async def _wrap(awaitable: Awaitable) -> object:
+        """Await any awaitable, a coroutine or a future, in a task."""
+        return await awaitable
+
+    async def _main(self, main: Awaitable) -> object:
+        """Await the main awaitable, then the tasks started and not done yet, so they are not cancelled."""
+        try:
+            return await main
+        finally:
+            while self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def run(self, main: Awaitable) -> object:
+        """
+        Run the main awaitable, usually the loop of a menu, in a new event loop, then stop the workers.
+        ------------------------------------------------------------------------------------------------
+        The tasks started while it runs, like an autosave, and the work they offloaded are finished first.
+        """
+        try:
+            return asyncio.run(self._main(main))
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """Stop the workers once the work offloaded is done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def tasks(self) -> Set[asyncio.Task]:
+        """Return the tasks started and not done yet."""
+        return set(self._tasks)
@@ -0,0 +1,318 @@
+# coding: utf-8
+
+"""
+Versioned binary scene format, to save and load many sprites at once.
+---------------------------------------------------------------------
+Layout of a scene file, little endian:
+- the header: magic, version, flags, counts, section offsets and the renderer which drew the pixel cache,
+- the string table: every font filename, image filename and message, stored once,
+- the records: one fixed-layout struct per sprite,
+- the pixel cache, optional: the BGRA pixels of the text and image sprites, 16 bytes aligned.
+The pixel cache is memory-mapped and wrapped as surfaces without copying, a cached image is used only if
+its fingerprint and the renderer match, the sprite is rendered again otherwise.
+The sprites are saved as their base class, Surface, Text or Image.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+import pygame
+
+from tools.sprites import Image, Sprite, Surface, Text
+
+MAGIC = b'PGSC'
+VERSION = 1
+NONE = 0xFFFFFFFF
+ALIGNMENT = 16
+
+HAS_PIXELS = 1
+
+SURFACE = 1
+TEXT = 2
+IMAGE = 3
+
+ANTIALIAS = 1
+BACKGROUND = 2
+ALPHA_KNOWN = 4
+ALPHA = 8
+CACHED = 16
+
+# MAGIC, VERSION, FLAGS, RECORDS COUNT, STRINGS COUNT, STRINGS/RECORDS/PIXELS OFFSETS, RENDERER
+HEADER = struct.Struct('<4sHHIIQQQ32s')
+# KIND, FLAGS, FONT SIZE, X, Y, WIDTH, HEIGHT, NAME, MESSAGE, COLOR, BACKGROUND, FINGERPRINT, PIXELS OFFSET
+RECORD = struct.Struct('<BBHddiiII4B4BIQ')
+LENGTH = struct.Struct('<I')
+
+
+def renderer() -> bytes:
+    """Return the name of the libraries drawing the pixel cache, the cache is stale if they change."""
+    return "pygame {} ttf {}".format(pygame.version.ver, pygame.font.get_sdl_ttf_version()).encode()[:32]
+
+
+def fingerprint(sprite: Sprite) -> int:
+    """Return a checksum of everything the image of a sprite depends on."""
+    if isinstance(sprite, Text):
+        key = (sprite.font_filename, sprite.font_size, sprite.message, sprite.antialias,
+               tuple(sprite.message_color), tuple(sprite.background_color or ()))
+    elif isinstance(sprite, Image):
+        try:
+            stat = os.stat(sprite.filename)
+            key = (sprite.filename, sprite.alpha, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            key = (sprite.filename, sprite.alpha)
+    else:
+        key = (sprite.size, tuple(sprite.color))
+    return zlib.crc32(repr(key).encode())
+
+
+def rgba(color: Optional[Tuple[int, ...]]) -> Tuple[int, int, int, int]:
+    """Return a color with its alpha, black if there is none."""
+    if color is None:
+        return (0, 0, 0, 0)
+    color = tuple(color)
+    return color + (255,) if len(color) == 3 else color
+
+
+def save(filename: str, sprites: List[Sprite], pixels: bool = True) -> int:
+    """
+    Save sprites in a scene file, with the pixel cache of the texts and images if pixels is True.
+    ---------------------------------------------------------------------------------------------
+    Return the size of the file.
+    """
+    return write(filename, pack(sprites, pixels))
+
+
+def pack(sprites: List[Sprite], pixels: bool = True) -> List[bytes]:
+    """
+    Return the chunks of a scene file holding sprites, with the pixel cache of the texts and images if pixels is True.
+    ------------------------------------------------------------------------------------------------------------------
+    The sprites are rendered if they are stale, so pack() must be called on the main thread,
+    the chunks can be written on any thread by write().
+    """
+    strings = []
+    indices = {}
+
+    def string(value: Optional[str]) -> int:
+        """Return the index of a string in the string table, add it if it is not."""
+        if value is None:
+            return NONE
+        if value not in indices:
+            indices[value] = len(strings)
+            strings.append(value)
+        return indices[value]
+
+    records = []
+    blobs = []
+    offset = 0
+    for sprite in sprites:
+        flags = 0
+        font_size = 0
+        name = message = NONE
+        color = background = (0, 0, 0, 0)
+        if isinstance(sprite, Text):
+            kind = TEXT
+            font_size = sprite.font_size
+            name = string(sprite.font_filename)
+            message = string(sprite.message)
+            color = rgba(sprite.message_color)
+            if sprite.antialias:
+                flags |= ANTIALIAS
+            if sprite.background_color is not None:
+                flags |= BACKGROUND
+                background = rgba(sprite.background_color)
+        elif isinstance(sprite, Image):
+            kind = IMAGE
+            name = string(sprite.filename)
+            if sprite.alpha is not None:
+                flags |= ALPHA_KNOWN | (ALPHA if sprite.alpha else 0)
+        elif isinstance(sprite, Surface):
+            kind = SURFACE
+            color = rgba(sprite.color)
+        else:
+            raise TypeError("Cannot save the sprite {!r}.".format(sprite))
+        pixels_offset = 0
+        if pixels and kind != SURFACE:
+            data = pygame.image.tobytes(sprite.image, 'BGRA')
+            flags |= CACHED
+            pixels_offset = offset
+            padding = -len(data) % ALIGNMENT
+            blobs.append(data + b'\0' * padding)
+            offset += len(data) + padding
+        (width, height) = sprite.size
+        records.append(RECORD.pack(kind, flags, font_size, sprite.x, sprite.y, width, height, name, message,
+                                   *color, *background, fingerprint(sprite), pixels_offset))
+    # WRITE STRINGS
+    table = b''.join([LENGTH.pack(len(value)) + value for value in [value.encode() for value in strings]])
+    strings_offset = HEADER.size
+    records_offset = strings_offset + len(table)
+    pixels_offset = records_offset + RECORD.size * len(records)
+    padding = -pixels_offset % ALIGNMENT
+    pixels_offset += padding
+    header = HEADER.pack(MAGIC, VERSION, HAS_PIXELS if blobs else 0, len(records), len(strings),
+                         strings_offset, records_offset, pixels_offset, renderer())
+    return [header, table, b''.join(records), b'\0' * padding] + blobs
+
+
+def write(filename: str, chunks: List[bytes]) -> int:
+    """Write the chunks returned by pack() in a scene file, return the size of the file."""
+    with open(filename, 'wb') as file:
+        for chunk in chunks:
+            file.write(chunk)
+        return file.tell()
+
+
+class SceneReader(object):
+    """
+    Read the sprites of a scene file, all at once, one by one or only the ones in an area.
+    --------------------------------------------------------------------------------------
+    Only the header and the string table are read when the reader is opened, the records are unpacked
+    when their sprites are asked. The sprites are not rendered if loaded is False and there is no pixel cache.
+    """
+
+    def __init__(self, filename: str, pixels: bool = True, loaded: bool = True) -> None:
+        """Open the scene file for the first time."""
+        self._loaded = loaded
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._view = memoryview(self._map)
+        (magic, version, flags, self._count, strings_count, strings_offset, self._records_offset,
+         self._pixels_offset, renderer_) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a scene file.".format(filename))
+        if version > VERSION:
+            raise ValueError("{} has the version {}, only {} is known.".format(filename, version, VERSION))
+        self._pixels = pixels and bool(flags & HAS_PIXELS)
+        self.renderer = renderer_.rstrip(b'\0')
+        self.stale = self._pixels and self.renderer != renderer()
+        self.hits = 0
+        self.misses = 0
+        # READ STRINGS
+        self._strings = []
+        offset = strings_offset
+        for _ in range(strings_count):
+            (length,) = LENGTH.unpack_from(self._map, offset)
+            offset += LENGTH.size
+            self._strings.append(bytes(self._view[offset:offset + length]).decode())
+            offset += length
+
+    def __enter__(self) -> 'SceneReader':
+        """Use the reader in a with statement."""
+        return self
+
+    def __exit__(self, *exception: object) -> None:
+        """Close the reader at the end of a with statement."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the reader, the file stays mapped while the cached images of loaded sprites are alive."""
+        if self._map is not None:
+            self._view.release()
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+            self._view = None
+
+    def __len__(self) -> int:
+        """Return the number of sprites in the scene."""
+        return self._count
+
+    def __getitem__(self, index: int) -> Sprite:
+        """Return a sprite of the scene."""
+        if not 0 <= index < self._count:
+            raise IndexError("scene index out of range")
+        return self._build(RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size))
+
+    def __iter__(self) -> Iterator[Sprite]:
+        """Iterate over the sprites of the scene."""
+        return self.stream()
+
+    def stream(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Sprite]:
+        """Return the sprites of the scene one by one, from start to stop, so loading can be spread over frames."""
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            yield self[index]
+
+    def areas(self) -> List[pygame.Rect]:
+        """Return the areas of every sprite of the scene, without building them."""
+        areas = []
+        offset = self._records_offset
+        for _ in range(self._count):
+            (x, y, width, height) = struct.unpack_from('<ddii', self._map, offset + 4)
+            areas.append(pygame.Rect((x, y), (width, height)))
+            offset += RECORD.size
+        return areas
+
+    def load(self, area: Optional[pygame.Rect] = None) -> List[Sprite]:
+        """Return every sprite of the scene, or only the ones colliding with an area."""
+        if area is None:
+            return list(self.stream())
+        return [self[index] for index in area.collidelistall(self.areas())]
+
+    def _cached(self, offset: int, size: (int, int), fingerprint_: int, sprite: Sprite) -> Optional[pygame.Surface]:
+        """Return the cached image of a sprite, None if it is stale."""
+        if self.stale or fingerprint(sprite) != fingerprint_:
+            self.misses += 1
+            return None
+        start = self._pixels_offset + offset
+        length = size[0] * size[1] * 4
+        if start + length > len(self._map):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pygame.image.frombuffer(self._view[start:start + length], size, 'BGRA')
+
+    def _build(self, record: tuple) -> Sprite:
+        """Return the sprite of a record, with its cached image if it is still valid."""
+        (kind, flags, font_size, x, y, width, height, name, message) = record[:9]
+        color = record[9:13]
+        background = record[13:17] if flags & BACKGROUND else None
+        (fingerprint_, offset) = record[17:]
+        pos = (x, y)
+        if kind == TEXT:
+            sprite = Text.__new__(Text)
+            sprite._font_filename = self._strings[name] if name != NONE else None
+            sprite._font_size = font_size
+            sprite.reset_font()
+            sprite._antialias = bool(flags & ANTIALIAS)
+            sprite._message = self._strings[message] if message != NONE else ""
+            sprite._message_color = color[:3]
+            sprite._background_color = background[:3] if background is not None else None
+        elif kind == IMAGE:
+            sprite = Image.__new__(Image)
+            sprite._filename = self._strings[name]
+            sprite._alpha = bool(flags & ALPHA) if flags & ALPHA_KNOWN else None
+        elif kind == SURFACE:
+            sprite = Surface.__new__(Surface)
+            sprite._size = (width, height)
+            sprite._color = color[:3]
+            sprite._pooled = False
+            sprite._buffer = None
+        else:
+            raise ValueError("Unknown sprite kind {}.".format(kind))
+        sprite._watchers = None
+        sprite._previous_area = None
+        sprite._pos = pos
+        sprite._image = None
+        sprite._stale = False
+        if self._pixels and flags & CACHED:
+            sprite._image = self._cached(offset, (width, height), fingerprint_, sprite)
+        if sprite._image is None and self._loaded:
+            sprite.reset_image()
+            sprite._area = None
+            sprite.reset_area()
+        else:
+            sprite._area = pygame.Rect(pos, (width, height))
+            sprite.invalidate()
+        return sprite
+
+
+def load(filename: str, area: Optional[pygame.Rect] = None, pixels: bool = True,
+         loaded: bool = True) -> List[Sprite]:
+    """Return the sprites of a scene file, or only the ones colliding with an area."""
+    with SceneReader(filename, pixels=pixels, loaded=loaded) as reader:
+        return reader.load(area)
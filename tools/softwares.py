@@ -1,21 +1,208 @@
 # coding: utf-8
 
+import asyncio
+import heapq
+import itertools
 import time
-from typing import List, Optional, Tuple, Union
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, Iterator, List, Optional, Tuple, Union
 
 import pygame
 import pygame.locals as pg
 
 from tools import decorators
 
+KEY_SLOTS = 1024
+KEY_DOWN = 1
+KEY_UP = 2
+BUTTON_SLOTS = 32
+WAIT_PHASES = ('tick', 'idle')
+STARTUP_TIME = time.perf_counter()
+
+
+class FrameStats(object):
+    """Keep the timings of the last frames, split in named phases, in ring buffers."""
+
+    def __init__(self, size: int = 600, budget: float = 50.0, enabled: bool = False) -> None:
+        """Create the frame statistics for the first time."""
+        self._size = size
+        self.budget = budget
+        self.enabled = enabled
+        self._phases = {}
+        self._current = {}
+        self._count = 0
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """End the phase, it lasted since the previous mark or the beginning of the frame."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def next_frame(self) -> None:
+        """Store the timings of the current frame and begin a new one."""
+        if not self.enabled:
+            return
+        index = self._count % self._size
+        frame = 0.0
+        for (phase, milliseconds) in self._current.items():
+            if phase not in WAIT_PHASES:
+                frame += milliseconds
+        self._current['frame'] = frame
+        for (phase, milliseconds) in self._current.items():
+            if phase not in self._phases:
+                self._phases[phase] = array('d', [0.0] * self._size)
+            self._phases[phase][index] = milliseconds
+        for (phase, timings) in self._phases.items():
+            if phase not in self._current:
+                timings[index] = 0.0
+        self._count += 1
+        self._current = {}
+        self._last = time.perf_counter()
+
+    def reset(self) -> None:
+        """Forget every stored frame."""
+        self._phases = {}
+        self._current = {}
+        self._count = 0
+        self._last = time.perf_counter()
+
+    @property
+    def phases(self) -> List[str]:
+        """Return the names of the measured phases."""
+        return list(self._phases)
+
+    @property
+    def count(self) -> int:
+        """Return the number of stored frames."""
+        return min(self._count, self._size)
+
+    def summary(self, phase: str = 'frame') -> Dict[str, float]:
+        """
+        Return the statistics of a phase over the stored frames, in milliseconds.
+        -------------------------------------------------------------------------
+        The 'frame' phase sums every phase but the waiting ones: 'tick' for the framerate and 'idle' for events.
+        The over_budget statistic counts the stored frames where the phase lasted more than the budget.
+        """
+        count = self.count
+        if count == 0 or phase not in self._phases:
+            return {'min': 0.0, 'mean': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'over_budget': 0}
+        timings = sorted(self._phases[phase][:count])
+        return {'min': timings[0],
+                'mean': sum(timings) / count,
+                'p95': timings[min(count - 1, int(0.95 * count))],
+                'p99': timings[min(count - 1, int(0.99 * count))],
+                'max': timings[-1],
+                'over_budget': count - sum([1 for timing in timings if timing <= self.budget])}
+
+    def report(self) -> str:
+        """Return the statistics of every phase as a printable table."""
+        lines = ["{:<12}{:>9}{:>9}{:>9}{:>9}{:>9}{:>7}".format("phase", "min", "mean", "p95", "p99", "max", "over")]
+        for phase in self.phases:
+            summary = self.summary(phase)
+            lines.append("{:<12}{min:>9.2f}{mean:>9.2f}{p95:>9.2f}{p99:>9.2f}{max:>9.2f}{over_budget:>7}".format(
+                phase, **summary))
+        return "\n".join(lines)
+
+
+@decorators.singleton(parameters=False)
+class Startup(object):
+    """Measure the time from the first import of the softwares to the first frame, split in named steps."""
+
+    def __init__(self) -> None:
+        """Create the startup timer for the first time."""
+        self._steps = []
+        self.first_frame = None
+
+    def mark(self, step: str) -> float:
+        """End a step of the startup, return the time passed since the first import in seconds."""
+        elapsed = time.perf_counter() - STARTUP_TIME
+        self._steps.append((step, elapsed))
+        return elapsed
+
+    def mark_first_frame(self) -> None:
+        """End the startup, at the first frame pushed to the display."""
+        if self.first_frame is None:
+            self.first_frame = self.mark('first frame')
+
+    @property
+    def steps(self) -> List[Tuple[str, float]]:
+        """Return the steps of the startup and the time they ended, in seconds since the first import."""
+        return list(self._steps)
+
+    def report(self) -> str:
+        """Return a readable table of the startup steps, in milliseconds."""
+        lines = ["{:<16}{:>10}{:>10}".format("step", "at", "took")]
+        previous = 0.0
+        for (step, elapsed) in self._steps:
+            lines.append("{:<16}{:>10.1f}{:>10.1f}".format(step, elapsed * 1000, (elapsed - previous) * 1000))
+            previous = elapsed
+        return "\n".join(lines)
+
+
+class Timer(object):
+    """Keep a callback or a coroutine scheduled on the clock, and cancel it."""
+
+    __slots__ = ('deadline', 'interval', 'callback', 'arguments', 'coroutine', 'cancelled', '_clock')
+
+    def __init__(self, clock: 'Clock', deadline: float, interval: Optional[float] = None,
+                 callback: Optional[Callable[..., None]] = None, arguments: tuple = (),
+                 coroutine: Optional[Generator[Optional[float], None, None]] = None) -> None:
+        """Create the timer for the first time."""
+        self._clock = clock
+        self.deadline = deadline
+        self.interval = interval
+        self.callback = callback
+        self.arguments = arguments
+        self.coroutine = coroutine
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Stop the timer, it is removed from the clock lazily."""
+        if not self.cancelled:
+            self.cancelled = True
+            self._clock._cancelled += 1
+
+    @property
+    def active(self) -> bool:
+        """Return True if the timer will run again, False otherwise."""
+        return not self.cancelled
+
 
 @decorators.singleton(parameters=False)
 class Clock(object):
-    """Manage time in pygame and pygame.time.Clock() using the singleton decorator."""
+    """
+    Manage time in pygame and pygame.time.Clock() using the singleton decorator.
+    ----------------------------------------------------------------------------
+    The clock also schedules delayed callbacks, repeating callbacks and coroutines in a min-heap of deadlines,
+    the due ones run at every tick, so thousands of timers cost only the ones due.
+    The delays are in seconds, measured with now(), time.time unless a recording is played.
+    Usage:
+    > timer = clock.call_later(0.5, option.onblur)
+    > timer.cancel()
+    > def blink():
+    >     while True:
+    >         option.message_color = (255, 0, 0)
+    >         yield 0.5
+    >         option.message_color = (0, 0, 0)
+    >         yield 0.5
+    > clock.spawn(blink())
+    """
 
     def __init__(self) -> None:
         """Create the clock for the first time."""
         self._clock = pygame.time.Clock()
+        self.stats = FrameStats()
+        self.uncapped = False
+        # MANAGE TIMERS
+        self.now = time.time
+        self._last_tick = time.perf_counter()
+        self._timers = []
+        self._order = itertools.count()
+        self._cancelled = 0
 
     @staticmethod
     def get_ticks() -> int:
@@ -25,7 +212,7 @@ class Clock(object):
         Return the number of milliseconds since pygame.init() was called.
         Before pygame is initialized this will always be 0.
         """
-        return pygame.time.get_tick()
+        return pygame.time.get_ticks()
 
     @staticmethod
     def wait(milliseconds: int) -> int:
@@ -77,8 +264,14 @@ class Clock(object):
         Note that this function uses SDL_Delay function which is not accurate on every platform.
         But this does not use much CPU.
         Use the tick_busy_loop() method if you want an accurate timer, and don't mind chewing CPU.
+        The framerate is ignored while the clock is uncapped, to replay recordings as fast as possible.
         """
-        return self._clock.tick(framerate)
+        milliseconds = self._clock.tick(0 if self.uncapped else framerate)
+        self.stats.mark('tick')
+        self.run_timers()
+        self.stats.mark('timers')
+        self.stats.next_frame()
+        return milliseconds
 
     def tick_busy_loop(self, framerate: int = 0) -> int:
         """
@@ -92,8 +285,39 @@ class Clock(object):
         Note that this function uses pygame.time.delay() which uses lots of CPU in a busy loop.
         This makes sure that timing is more accurate.
         Use the tick() method if you want a less accurate timing but less CPU usage.
+        The framerate is ignored while the clock is uncapped, to replay recordings as fast as possible.
+        """
+        milliseconds = self._clock.tick_busy_loop(0 if self.uncapped else framerate)
+        self.stats.mark('tick')
+        self.run_timers()
+        self.stats.mark('timers')
+        self.stats.next_frame()
+        return milliseconds
+
+    async def tick_async(self, framerate: int = 0) -> int:
+        """
+        Update the clock, without blocking the asyncio event loop.
+        ------------------------------------------------------------
+        This method should be awaited once per frame, in place of tick().
+        It sleeps with asyncio.sleep() to keep the game running slower than the optional given framerate argument,
+        so the other tasks run meanwhile, and wakes up early if a timer is due before the next frame.
+        It always gives the other tasks a turn, even when the frame is late.
+        The framerate is ignored while the clock is uncapped, to replay recordings as fast as possible.
         """
-        return self._clock.tick_busy_loop(framerate)
+        delay = 0.0
+        if framerate and not self.uncapped:
+            delay = self._last_tick + 1 / framerate - time.perf_counter()
+            remaining = self.time_until_next()
+            if remaining is not None:
+                delay = min(delay, remaining)
+        await asyncio.sleep(max(0.0, delay))
+        self._last_tick = time.perf_counter()
+        milliseconds = self._clock.tick()
+        self.stats.mark('tick')
+        self.run_timers()
+        self.stats.mark('timers')
+        self.stats.next_frame()
+        return milliseconds
 
     def get_time(self) -> int:
         """
@@ -101,7 +325,7 @@ class Clock(object):
         --------------------------------------------------
         Return the number of milliseconds that passed between the previous two calls to the tick() method.
         """
-        return self._clock.get_time
+        return self._clock.get_time()
 
     def get_rawtime(self) -> int:
         """
@@ -120,16 +344,202 @@ class Clock(object):
         """
         return self._clock.get_fps()
 
+    def mark(self, phase: str) -> None:
+        """End a phase of the current frame for the frame statistics. Delegating method."""
+        self.stats.mark(phase)
+
+    def _schedule(self, timer: Timer) -> Timer:
+        """Push a timer in the heap of deadlines."""
+        heapq.heappush(self._timers, (timer.deadline, next(self._order), timer))
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[..., None], *arguments: object) -> Timer:
+        """Call callback with arguments once, after delay seconds. Return the timer, to cancel it."""
+        return self._schedule(Timer(self, self.now() + delay, callback=callback, arguments=arguments))
+
+    def call_every(self, interval: float, callback: Callable[..., None], *arguments: object,
+                   delay: Optional[float] = None) -> Timer:
+        """Call callback with arguments every interval seconds, the first time after delay, interval if None."""
+        deadline = self.now() + (interval if delay is None else delay)
+        return self._schedule(Timer(self, deadline, interval=interval, callback=callback, arguments=arguments))
+
+    def spawn(self, coroutine: Generator[Optional[float], None, None], delay: float = 0) -> Timer:
+        """
+        Run a generator as a coroutine, after delay seconds.
+        -----------------------------------------------------
+        The coroutine is resumed at a tick, runs until its next yield, and sleeps the number of seconds yielded.
+        It yields None to be resumed at the next tick. The timer is cancelled when the coroutine returns.
+        """
+        return self._schedule(Timer(self, self.now() + delay, coroutine=coroutine))
+
+    def run_timers(self, now: Optional[float] = None) -> int:
+        """
+        Run the timers due now, or at the current time. Called by tick() and tick_busy_loop().
+        -----------------------------------------------------------------------------------------
+        The timers scheduled while running are due at the next call at the earliest.
+        Return the number of timers run.
+        """
+        now = self.now() if now is None else now
+        timers = self._timers
+        due = []
+        while timers and timers[0][0] <= now:
+            due.append(heapq.heappop(timers)[2])
+        count = 0
+        for timer in due:
+            if timer.cancelled:
+                self._cancelled -= 1
+                continue
+            count += 1
+            if timer.coroutine is not None:
+                try:
+                    delay = next(timer.coroutine)
+                except StopIteration:
+                    if timer.cancelled:
+                        self._cancelled -= 1
+                    timer.cancelled = True
+                    continue
+                if timer.cancelled:
+                    self._cancelled -= 1
+                    continue
+                timer.deadline = now + (delay or 0)
+                self._schedule(timer)
+            elif timer.interval is not None:
+                timer.callback(*timer.arguments)
+                if not timer.cancelled:
+                    timer.deadline += timer.interval
+                    if timer.deadline <= now:
+                        # The clock fell behind, the missed calls are dropped
+                        timer.deadline = now + timer.interval
+                    self._schedule(timer)
+                else:
+                    self._cancelled -= 1
+            else:
+                timer.cancelled = True
+                timer.callback(*timer.arguments)
+        self.reduce_timers()
+        return count
+
+    def reduce_timers(self) -> None:
+        """Remove the cancelled timers from the heap, once they are the most of it."""
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._timers):
+            self._timers = [entry for entry in self._timers if not entry[2].cancelled]
+            heapq.heapify(self._timers)
+            self._cancelled = 0
+
+    def cancel_timers(self) -> None:
+        """Cancel every timer."""
+        for (_, _, timer) in self._timers:
+            timer.cancelled = True
+        self._timers = []
+        self._cancelled = 0
+
+    @property
+    def next_deadline(self) -> Optional[float]:
+        """Return the time the next timer is due, None if there is no timer."""
+        timers = self._timers
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+            self._cancelled -= 1
+        return timers[0][0] if timers else None
+
+    def time_until_next(self) -> Optional[float]:
+        """Return the seconds left before the next timer is due, 0 if one is late, None if there is no timer."""
+        deadline = self.next_deadline
+        if deadline is None:
+            return None
+        return max(0.0, deadline - self.now())
+
+    @property
+    def timers(self) -> int:
+        """Return the number of timers scheduled."""
+        return len(self._timers) - self._cancelled
+
+
+class FixedStepLoop(object):
+    """
+    Run a game loop with a fixed simulation step and a separate render rate, paced by the clock.
+    ---------------------------------------------------------------------------------------------
+    Every frame runs the simulation steps due since the previous frame, then renders once.
+    The render receives alpha, the fraction of step elapsed since the last simulation step, to interpolate.
+    A frame never simulates more than max_frame_time seconds, and never more than max_steps steps:
+    when the machine falls behind, the late steps are dropped instead of piling up.
+    The frames which dropped steps are counted in skipped_frames, the steps in dropped_steps.
+    """
+
+    def __init__(self, update: Callable[[float], None], render: Callable[[float], None], step: float = 1 / 60,
+                 framerate: int = 0, max_frame_time: float = 0.25, max_steps: int = 5) -> None:
+        """Create the loop for the first time."""
+        self.update = update
+        self.render = render
+        self.step = step
+        self.framerate = framerate
+        self.max_frame_time = max_frame_time
+        self.max_steps = max_steps
+        self.running = True
+        self.alpha = 0.0
+        self.frames = 0
+        self.steps = 0
+        self.skipped_frames = 0
+        self.dropped_steps = 0
+        self._accumulator = 0.0
+        self._time = None
+        self._clock = Clock()
+
+    def frame(self) -> int:
+        """Run one frame: the due simulation steps, then one render. Return the number of steps run."""
+        self._clock.tick(self.framerate)
+        now = time.perf_counter()
+        dropped = 0
+        if self._time is not None:
+            elapsed = now - self._time
+            if elapsed > self.max_frame_time:
+                dropped += int((elapsed - self.max_frame_time) // self.step)
+                elapsed = self.max_frame_time
+            self._accumulator += elapsed
+        self._time = now
+        steps = 0
+        while self._accumulator >= self.step:
+            if steps == self.max_steps:
+                late = int(self._accumulator // self.step)
+                self._accumulator -= late * self.step
+                dropped += late
+                break
+            self.update(self.step)
+            self._accumulator -= self.step
+            steps += 1
+        self._clock.mark('update')
+        if dropped:
+            self.skipped_frames += 1
+            self.dropped_steps += dropped
+        self.alpha = self._accumulator / self.step
+        self.render(self.alpha)
+        self._clock.mark('render')
+        self.frames += 1
+        self.steps += steps
+        return steps
+
+    def run(self, running: Optional[Callable[[], bool]] = None) -> None:
+        """Run frames until the loop stops running, or running returns False."""
+        self._time = None
+        while self.running and (running is None or running()):
+            self.frame()
+
 
 @decorators.singleton(parameters=False)
 class Screen(object):
-    """Simulate a screen software."""
+    """
+    Simulate a screen software.
+    ---------------------------
+    The window is opened the first time the screen image or the display is used, or when open() is called,
+    so the screen can be configured before and the modules using it can be imported without a window.
+    The display mode is set once for all the changes made in a batch, and once per frame for the resize events.
+    """
 
     def __init__(self, size: (int, int) = (800, 600), color: (int, int, int) = (255, 255, 255),
                  title: str = "Pygame Window", flags: Optional[List[str]] = None) -> None:
         """Create the screen for the first time."""
-        info = pygame.display.Info()
-        self._fullscreen_size = (info.current_w, info.current_h)
+        self._opened = False
+        self._fullscreen_size = None
         self._windowedscreen_size = size
         self._color = color
         self._title = title
@@ -141,38 +551,135 @@ class Screen(object):
         self._opengl = 'OPENGL' in flags
         self._resizable = 'RESIZABLE' in flags
         self._noframe = 'NOFRAME' in flags
-        self.reset_screen()
+        self._revision = 0
+        self._mode = 0
+        self._pixels = 0
+        self._watchers = []
+        self._batch = 0
+        self._reset_pending = False
+        self._resize = None
         self.running = True
-        self.size = size
+        # ACTIVEEVENT is not handled: event.gain = [0, 1], event.state = [?, 1, 2, ?, 6, ?]
+        self.handlers = {pg.QUIT: self._quit, pg.VIDEOEXPOSE: self._videoexpose, pg.VIDEORESIZE: self._videoresize}
+
+    def open(self) -> None:
+        """Initialize the display and open the window, if it is not opened."""
+        if self._opened:
+            return
+        if not pygame.display.get_init():
+            pygame.display.init()
+        self._opened = True
+        self.reset_screen()
+        Startup().mark('display')
+
+    @contextmanager
+    def batch(self) -> Iterator['Screen']:
+        """
+        Set the display mode once for every change made in the with statement.
+        ------------------------------------------------------------------------
+        Usage:
+        > with screen.batch():
+        >     screen.size = (1024, 768)
+        >     screen.resizable = True
+        >     screen.noframe = False
+        """
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+            if self._batch == 0 and self._reset_pending:
+                self._reset_pending = False
+                self.reset_screen()
 
     def reset_screen(self) -> None:
-        """Reset some attributes of the screen."""
+        """Reset some attributes of the screen, if the window is opened, at the end of the batch if there is one."""
+        if not self._opened:
+            return
+        if self._batch:
+            self._reset_pending = True
+            return
         pygame.display.set_mode(self.size, self.flags)
+        self._mode += 1
         self.reset_color()
         self.reset_title()
+        for watcher in list(self._watchers):
+            watcher(self)
+
+    def watch(self, watcher: Callable[['Screen'], None]) -> None:
+        """Call watcher with the screen every time its display mode is set again."""
+        if watcher not in self._watchers:
+            self._watchers.append(watcher)
+
+    def unwatch(self, watcher: Callable[['Screen'], None]) -> None:
+        """Stop calling watcher when the display mode is set again."""
+        if watcher in self._watchers:
+            self._watchers.remove(watcher)
 
     def reset_color(self) -> None:
-        """Reset the background color of the screen."""
+        """Reset the background color of the screen, if the window is opened."""
+        if not self._opened:
+            return
         pygame.display.get_surface().fill(self.color)
+        self._revision += 1
 
     def reset_title(self) -> None:
-        """Reset the title of the screen."""
+        """Reset the title of the screen, if the window is opened."""
+        if not self._opened:
+            return
         pygame.display.set_caption(self.title)
 
     def update(self, events: List[pygame.event.EventType]) -> None:
         """Update some events for the screen."""
+        handlers = self.handlers
         for event in events:
-            if event.type == pg.QUIT:
-                self.running = False
-            elif event.type == pg.ACTIVEEVENT:
-                pass
-                # event.gain = [0, 1]
-                # event.state = [?, 1, 2, ?, 6, ?]
-            elif event.type == pg.VIDEOEXPOSE:
-                pygame.display.update()
-            elif event.type == pg.VIDEORESIZE:
-                if event.size != self.size:
-                    self.size = event.size
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+        self.end_frame()
+
+    def end_frame(self) -> None:
+        """Apply the last resize event of the frame, the display mode is set once."""
+        if self._resize is not None:
+            size = self._resize
+            self._resize = None
+            if size != self.size:
+                self.size = size
+
+    def _quit(self, event: pygame.event.EventType) -> None:
+        """Manage the QUIT events."""
+        self.running = False
+
+    @staticmethod
+    def _videoexpose(event: pygame.event.EventType) -> None:
+        """Manage the VIDEOEXPOSE events."""
+        pygame.display.update()
+
+    def _videoresize(self, event: pygame.event.EventType) -> None:
+        """Manage the VIDEORESIZE events, only the last size of the frame is applied."""
+        self._resize = event.size
+
+    def display(self, rects: Optional[List[pygame.Rect]] = None) -> int:
+        """
+        Update the screen display. Delegating method.
+        ---------------------------------------------
+        Push only the given areas of the screen image to the display, or all of it if rects is None.
+        An empty list of areas does not touch the display at all.
+        Return the number of pixels pushed.
+        """
+        if not self._opened:
+            self.open()
+        if Startup().first_frame is None:
+            Startup().mark_first_frame()
+        if rects is None:
+            pygame.display.update()
+            self._pixels = self.image.get_width() * self.image.get_height()
+        elif rects:
+            pygame.display.update(rects)
+            self._pixels = sum([rect.width * rect.height for rect in rects])
+        else:
+            self._pixels = 0
+        return self._pixels
 
     def blit(self, source: pygame.Surface, destination: Union[Tuple[int, int], pygame.Rect],
              area: bool = None, special_flags: int = 0) -> pygame.Rect:
@@ -183,7 +690,7 @@ class Screen(object):
     def width(self) -> int:
         """Return the current screen width."""
         if self._fullscreen:
-            return self._fullscreen_size[0]
+            return self.fullscreen_size[0]
         return self._windowedscreen_size[0]
 
     @width.setter
@@ -197,7 +704,7 @@ class Screen(object):
     def height(self) -> int:
         """Return the current screen height."""
         if self._fullscreen:
-            return self._fullscreen_size[1]
+            return self.fullscreen_size[1]
         return self._windowedscreen_size[1]
 
     @height.setter
@@ -211,7 +718,7 @@ class Screen(object):
     def size(self) -> (int, int):
         """Return the current screen size."""
         if self._fullscreen:
-            return self._fullscreen_size
+            return self.fullscreen_size
         return self._windowedscreen_size
 
     @size.setter
@@ -234,16 +741,21 @@ class Screen(object):
     @property
     def fullscreen_width(self) -> int:
         """Return the current fullscreen width."""
-        return self._fullscreen_size[0]
+        return self.fullscreen_size[0]
 
     @property
     def fullscreen_height(self) -> int:
         """Return the current fullscreen height."""
-        return self._fullscreen_size[1]
+        return self.fullscreen_size[1]
 
     @property
     def fullscreen_size(self) -> (int, int):
-        """Return the current fullscreen size."""
+        """Return the current fullscreen size, the display is initialized the first time."""
+        if self._fullscreen_size is None:
+            if not pygame.display.get_init():
+                pygame.display.init()
+            info = pygame.display.Info()
+            self._fullscreen_size = (info.current_w, info.current_h)
         return self._fullscreen_size
 
     @property
@@ -343,62 +855,172 @@ class Screen(object):
 
     @property
     def image(self) -> pygame.Surface:
-        """Return the current screen image."""
+        """Return the current screen image, the window is opened the first time."""
+        if not self._opened:
+            self.open()
         return pygame.display.get_surface()
 
     @property
     def area(self) -> pygame.Rect:
         """Return the current screen area."""
-        return pygame.display.get_surface().get_rect()
+        return self.image.get_rect()
+
+    @property
+    def opened(self) -> bool:
+        """Return True if the window is opened, False otherwise."""
+        return self._opened
+
+    @property
+    def revision(self) -> int:
+        """Return the number of times the screen image has been cleared."""
+        return self._revision
+
+    @property
+    def mode(self) -> int:
+        """Return the number of times the display mode has been set."""
+        return self._mode
+
+    @property
+    def pixels(self) -> int:
+        """Return the number of pixels pushed to the display during the last update."""
+        return self._pixels
 
 
 @decorators.singleton(parameters=False)
 class Keyboard(object):
-    """Simulate a keyboard software."""
+    """
+    Simulate a keyboard software.
+    -----------------------------
+    The state of the keys is stored in arrays indexed by slot.
+    The keycodes under 512 use their own slot, the keycodes made from a scancode use the 512 next slots.
+    The key names share the slot of their keycode, the other keycodes and unicode characters get new slots.
+    """
 
     def __init__(self) -> None:
         """Create the keyboard for the first time."""
-        self._key_type = {}
-        self._key_first = {}
-        self._key_time = {}
+        self._key_state = bytearray(KEY_SLOTS)
+        self._key_first = bytearray(KEY_SLOTS)
+        self._key_time = array('d', bytes(8 * KEY_SLOTS))
+        self._key_named = bytearray(KEY_SLOTS)
+        self._slots = None
         self._unicode = {}
+        self._now = time.time()
+        self.handlers = {pg.KEYDOWN: self._keydown, pg.KEYUP: self._keyup}
+
+    def reset_slots(self) -> None:
+        """Index the keycodes and the names of every pygame key on their slot."""
+        self._slots = {}
+        for slot in range(512):
+            self._slots[slot] = slot
+            self._slots[0x40000000 | slot] = 512 + slot
+        for name in dir(pg):
+            if name.startswith('K_'):
+                self._name(getattr(pg, name))
+
+    def _slot(self, key: Union[int, str], create: bool = False) -> Optional[int]:
+        """Return the slot of a keycode, a key name or a unicode character, None if it has no slot."""
+        if key.__class__ is int:
+            if 0 <= key < 512:
+                return key
+            elif key & 0x40000000 and (key & 0x3FFFFFFF) < 512:
+                return 512 + (key & 0x1FF)
+        if self._slots is None:
+            self.reset_slots()
+        slot = self._slots.get(key)
+        if slot is None and create:
+            slot = self._slots[key] = len(self._key_state)
+            self._key_state.append(0)
+            self._key_first.append(0)
+            self._key_time.append(0.0)
+            self._key_named.append(0)
+        return slot
+
+    def _name(self, key: int) -> int:
+        """Return the slot of a keycode, index the key name on it the first time."""
+        if self._slots is None:
+            self.reset_slots()
+        slot = self._slot(key, create=True)
+        if not self._key_named[slot]:
+            self._key_named[slot] = 1
+            name = pygame.key.name(key)
+            if name != '' and name not in self._slots:
+                self._slots[name] = slot
+        return slot
 
     def update(self, events: List[pygame.event.EventType]) -> None:
         """Update events for the keyboard."""
+        self.begin_frame()
+        handlers = self.handlers
         for event in events:
-            if event.type == pg.KEYDOWN:
-                self._key_type[event.key] = pg.KEYDOWN
-                self._key_first[event.key] = True
-                if event.unicode != '':
-                    self._key_type[event.unicode] = pg.KEYDOWN
-                    self._key_first[event.unicode] = True
-                    self._unicode[(event.key, event.mod)] = event.unicode
-                if pygame.key.name(event.key) != '':
-                    self._key_type[pygame.key.name(event.key)] = pg.KEYDOWN
-                    self._key_first[pygame.key.name(event.key)] = True
-            elif event.type == pg.KEYUP:
-                self._key_type[event.key] = pg.KEYUP
-                if (event.key, event.mod) in self._unicode:
-                    unicode = self._unicode[(event.key, event.mod)]
-                    self._key_type[unicode] = pg.KEYUP
-                if pygame.key.name(event.key) != '':
-                    self._key_type[pygame.key.name(event.key)] = pg.KEYUP
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+
+    def begin_frame(self, now: Optional[float] = None) -> None:
+        """Take the time of the frame, now or the current time, used by every push of the frame."""
+        self._now = time.time() if now is None else now
+
+    def _keydown(self, event: pygame.event.EventType) -> None:
+        """Manage the KEYDOWN events."""
+        slot = self._name(event.key)
+        self._key_state[slot] = KEY_DOWN
+        self._key_first[slot] = 1
+        if event.unicode != '':
+            slot = self._slot(event.unicode, create=True)
+            self._key_state[slot] = KEY_DOWN
+            self._key_first[slot] = 1
+            self._unicode[event.key] = slot
+
+    def _keyup(self, event: pygame.event.EventType) -> None:
+        """Manage the KEYUP events, the character slot is the one set by the key, whatever the modifiers now."""
+        for slot in (self._name(event.key), self._unicode.pop(event.key, None)):
+            if slot is not None and self._key_state[slot]:
+                self._key_state[slot] = KEY_UP
 
     def push(self, key: Union[int, str], delay: float = 0) -> Optional[bool]:
         """Know if a keyboard key is pushed, depends on delay."""
-        if key not in self._key_type or key not in self._key_first:
+        slots = self._slots
+        if slots is None:
+            self.reset_slots()
+            slots = self._slots
+        if key not in slots:
+            return None
+        slot = slots[key]
+        state = self._key_state[slot]
+        if not state:
             return None
-        elif self._key_first[key] is True:
-            self._key_first[key] = False
-            self._key_time[key] = time.time()
+        elif self._key_first[slot]:
+            self._key_first[slot] = 0
+            self._key_time[slot] = self._now
             return True
-        elif self._key_type[key] is not pg.KEYDOWN:
+        elif state != KEY_DOWN:
             return False
-        elif time.time() - self._key_time[key] >= delay:
-            self._key_time[key] = time.time()
+        elif self._now - self._key_time[slot] >= delay:
+            self._key_time[slot] = self._now
             return True
         return False
 
+    @property
+    def held(self) -> bool:
+        """Return True if a keyboard key is held down, False otherwise."""
+        return KEY_DOWN in self._key_state
+
+    def snapshot(self) -> tuple:
+        """Return a copy of the keyboard state, to restore it later."""
+        return (bytes(self._key_state), bytes(self._key_first), self._key_time.tobytes(), self._now,
+                dict(self._slots) if self._slots is not None else None, bytes(self._key_named), dict(self._unicode))
+
+    def restore(self, snapshot: tuple) -> None:
+        """Restore a keyboard state returned by snapshot."""
+        (state, first, time_, self._now, slots, named, unicode) = snapshot
+        self._key_state = bytearray(state)
+        self._key_first = bytearray(first)
+        self._key_time = array('d')
+        self._key_time.frombytes(time_)
+        self._slots = dict(slots) if slots is not None else None
+        self._key_named = bytearray(named)
+        self._unicode = dict(unicode)
+
 
 @decorators.singleton(parameters=False)
 class Mouse(object):
@@ -408,22 +1030,42 @@ class Mouse(object):
         """Create the mouse for the first time."""
         self._pos = (0, 0)
         self._rel = (0, 0)
-        self._button_type = {}
-        self._button_first = {}
-        self._button_time = {}
+        self._button_state = bytearray(BUTTON_SLOTS)
+        self._button_first = bytearray(BUTTON_SLOTS)
+        self._button_time = array('d', bytes(8 * BUTTON_SLOTS))
+        self._now = time.time()
+        self.handlers = {pg.MOUSEBUTTONDOWN: self._mousebuttondown, pg.MOUSEBUTTONUP: self._mousebuttonup,
+                         pg.MOUSEMOTION: self._mousemotion}
 
     def update(self, events: List[pygame.event.EventType]) -> None:
         """Update events for the mouse."""
-        self._rel = (0, 0)
+        self.begin_frame()
+        handlers = self.handlers
         for event in events:
-            if event.type == pg.MOUSEBUTTONDOWN:
-                self._button_type[event.button] = pg.MOUSEBUTTONDOWN
-                self._button_first[event.button] = True
-            elif event.type == pg.MOUSEBUTTONUP:
-                self._button_type[event.button] = pg.MOUSEBUTTONUP
-            elif event.type == pg.MOUSEMOTION:
-                self._pos = event.pos
-                self._rel = event.rel
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+
+    def begin_frame(self, now: Optional[float] = None) -> None:
+        """Forget the relative position of the previous frame and take the time of the frame, now or the current time."""
+        self._rel = (0, 0)
+        self._now = time.time() if now is None else now
+
+    def _mousebuttondown(self, event: pygame.event.EventType) -> None:
+        """Manage the MOUSEBUTTONDOWN events."""
+        if event.button < BUTTON_SLOTS:
+            self._button_state[event.button] = KEY_DOWN
+            self._button_first[event.button] = 1
+
+    def _mousebuttonup(self, event: pygame.event.EventType) -> None:
+        """Manage the MOUSEBUTTONUP events."""
+        if event.button < BUTTON_SLOTS and self._button_state[event.button]:
+            self._button_state[event.button] = KEY_UP
+
+    def _mousemotion(self, event: pygame.event.EventType) -> None:
+        """Manage the MOUSEMOTION events."""
+        self._pos = event.pos
+        self._rel = event.rel
 
     @property
     def xpos(self) -> int:
@@ -461,19 +1103,37 @@ class Mouse(object):
 
     def push(self, button: int, delay: int = 0) -> Optional[bool]:
         """Know if a mouse button is pushed, depends on delay."""
-        if button not in self._button_type:
+        if not 0 <= button < BUTTON_SLOTS or not self._button_state[button]:
             return None
         elif self._button_first[button]:
-            self._button_first[button] = False
-            self._button_time[button] = time.time()
+            self._button_first[button] = 0
+            self._button_time[button] = self._now
             return True
-        elif self._button_type[button] is not pg.MOUSEBUTTONDOWN:
+        elif self._button_state[button] != KEY_DOWN:
             return False
-        elif time.time() - self._button_time[button] >= delay:
-            self._button_time[button] = time.time()
+        elif self._now - self._button_time[button] >= delay:
+            self._button_time[button] = self._now
             return True
         return False
 
+    @property
+    def held(self) -> bool:
+        """Return True if a mouse button is held down, False otherwise."""
+        return KEY_DOWN in self._button_state
+
+    def snapshot(self) -> tuple:
+        """Return a copy of the mouse state, to restore it later."""
+        return (self._pos, self._rel, bytes(self._button_state), bytes(self._button_first),
+                self._button_time.tobytes(), self._now)
+
+    def restore(self, snapshot: tuple) -> None:
+        """Restore a mouse state returned by snapshot."""
+        (self._pos, self._rel, state, first, time_, self._now) = snapshot
+        self._button_state = bytearray(state)
+        self._button_first = bytearray(first)
+        self._button_time = array('d')
+        self._button_time.frombytes(time_)
+
     @staticmethod
     def set_visible(value: bool = True) -> None:
         """Turn the mouse cursor visibility to value. Delegating method."""
@@ -486,17 +1146,27 @@ class Mouse(object):
 
     def inside(self, area: pygame.Rect) -> bool:
         """Know if the mouse cursor is inside an area."""
-        pos = self._pos
-        top = area.topleft
-        bot = area.bottomright
-        if top[0] <= pos[0] <= bot[0] and top[1] <= pos[1] <= bot[1]:
-            return True
-        return False
+        (x, y) = self._pos
+        return area.left <= x <= area.right and area.top <= y <= area.bottom
+
+    def hover(self, index: object, sprite: Optional[object] = None) -> Optional[object]:
+        """
+        Return the top sprite of a sprites.SpatialGrid under the mouse cursor, None if there is none.
+        ---------------------------------------------------------------------------------------------
+        The sprite argument is checked first, it is usually the sprite hovered during the previous frame.
+        """
+        if sprite is not None and sprite in index and self.inside(sprite.area):
+            return sprite
+        return index.at(self._pos)
 
 
 @decorators.singleton(parameters=True)
 class Joystick(object):
-    """Simulate a joystick software."""
+    """
+    Simulate a joystick software.
+    -----------------------------
+    Only one joystick, the JoystickManager of tools.joysticks manages every pad at once, plugged or unplugged.
+    """
 
     def __init__(self, id_: int = 0) -> None:
         """Create the joystick for the first time."""
@@ -514,15 +1184,16 @@ class Joystick(object):
         self._ball_first = {}
         self._ball_time = {}
         self._name = "Joystick not detected by pygame."
+        self._now = time.time()
         self.reset_joystick()
+        self.handlers = {pg.JOYDEVICEADDED: self._joydeviceadded, pg.JOYBUTTONDOWN: self._joybuttondown,
+                         pg.JOYBUTTONUP: self._joybuttonup, pg.JOYAXISMOTION: self._joyaxismotion,
+                         pg.JOYHATMOTION: self._joyhatmotion, pg.JOYBALLMOTION: self._joyballmotion}
 
     def reset_joystick(self) -> None:
-        """Reset some attributes of the joystick."""
-        # If pygame do not detect the joystick
-        if self._id >= pygame.joystick.get_count():
-            pygame.joystick.quit()
+        """Reset some attributes of the joystick, if pygame detects it. A joystick plugged later is added by event."""
+        if not pygame.joystick.get_init():
             pygame.joystick.init()
-        # If pygame detect the joystick
         if self._id < pygame.joystick.get_count():
             joystick = pygame.joystick.Joystick(self._id)
             joystick.init()
@@ -530,30 +1201,54 @@ class Joystick(object):
 
     def update(self, events: List[pygame.event.EventType]) -> None:
         """Update events for the joystick."""
+        self.begin_frame()
+        handlers = self.handlers
         for event in events:
-            if event.type == pg.JOYBUTTONDOWN:
-                if event.joy == self._id:
-                    self._button_type[event.button] = pg.JOYBUTTONDOWN
-                    self._button_first[event.button] = True
-            elif event.type == pg.JOYBUTTONUP:
-                if event.joy == self._id:
-                    self._button_type[event.button] = pg.JOYBUTTONUP
-            elif event.type == pg.JOYAXISMOTION:
-                if event.joy == self._id:
-                    # -1 <= event.value <= 1
-                    self._axis_value[event.axis] = event.value
-                    self._axis_first[event.axis] = True
-            elif event.type == pg.JOYHATMOTION:
-                if event.joy == self._id:
-                    # (-1, -1) <= event.value <= (1, 1)
-                    self._hat_value[event.hat] = event.value
-                    self._hat_first[event.hat] = True
-            elif event.type == pg.JOYBALLMOTION:
-                if event.joy == self._id:
-                    # event.rel = ?
-                    self._ball_value[event.ball] = event.rel
-                    self._ball_time[event.ball] = time.time()
-                    self._ball_first[event.ball] = True
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+
+    def begin_frame(self, now: Optional[float] = None) -> None:
+        """Take the time of the frame, now or the current time, used by every push of the frame."""
+        self._now = time.time() if now is None else now
+
+    def _joydeviceadded(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYDEVICEADDED events."""
+        if event.device_index == self._id:
+            self.reset_joystick()
+
+    def _joybuttondown(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBUTTONDOWN events."""
+        if event.joy == self._id:
+            self._button_type[event.button] = pg.JOYBUTTONDOWN
+            self._button_first[event.button] = True
+
+    def _joybuttonup(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBUTTONUP events."""
+        if event.joy == self._id:
+            self._button_type[event.button] = pg.JOYBUTTONUP
+
+    def _joyaxismotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYAXISMOTION events."""
+        if event.joy == self._id:
+            # -1 <= event.value <= 1
+            self._axis_value[event.axis] = event.value
+            self._axis_first[event.axis] = True
+
+    def _joyhatmotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYHATMOTION events."""
+        if event.joy == self._id:
+            # (-1, -1) <= event.value <= (1, 1)
+            self._hat_value[event.hat] = event.value
+            self._hat_first[event.hat] = True
+
+    def _joyballmotion(self, event: pygame.event.EventType) -> None:
+        """Manage the JOYBALLMOTION events."""
+        if event.joy == self._id:
+            # event.rel = ?
+            self._ball_value[event.ball] = event.rel
+            self._ball_time[event.ball] = self._now
+            self._ball_first[event.ball] = True
 
     @property
     def id(self) -> int:
@@ -571,12 +1266,12 @@ class Joystick(object):
             return None
         elif self._button_first[button]:
             self._button_first[button] = False
-            self._button_time[button] = time.time()
+            self._button_time[button] = self._now
             return True
         elif self._button_type[button] is not pg.JOYBUTTONDOWN:
             return False
-        elif time.time() - self._button_time[button] >= delay:
-            self._button_time[button] = time.time()
+        elif self._now - self._button_time[button] >= delay:
+            self._button_time[button] = self._now
             return True
         return False
 
@@ -586,12 +1281,12 @@ class Joystick(object):
             return None
         elif self._axis_first[axis]:
             self._axis_first[axis] = False
-            self._axis_time[axis] = time.time()
+            self._axis_time[axis] = self._now
             return True
         elif -0.1 <= self._axis_value[axis] <= 0.1:
             return False
-        elif time.time() - self._axis_time[axis] >= delay:
-            self._axis_time[axis] = time.time()
+        elif self._now - self._axis_time[axis] >= delay:
+            self._axis_time[axis] = self._now
             return True
         return False
 
@@ -605,15 +1300,169 @@ class Joystick(object):
             return None
         elif self._hat_first[hat]:
             self._hat_first[hat] = False
-            self._hat_time[hat] = time.time()
+            self._hat_time[hat] = self._now
             return True
         elif self._hat_value[hat] == (0, 0):
             return False
-        elif time.time() - self._hat_time[hat] >= delay:
-            self._hat_time[hat] = time.time()
+        elif self._now - self._hat_time[hat] >= delay:
+            self._hat_time[hat] = self._now
             return True
         return False
 
     def get_hat(self, hat: int) -> (int, int):
         """Return the current value of the joystick hat button."""
         return self._hat_value[hat] if hat in self._hat_value else None
+
+
+@decorators.singleton(parameters=False)
+class EventBus(object):
+    """
+    Pull the pygame events once per frame and dispatch them to their subscribers, by event type.
+    --------------------------------------------------------------------------------------------
+    The events come from the source, pygame.event.get() if it is None, and the frame time from the clock,
+    so a recording can be played back in place of the pygame events, with its own times.
+    """
+
+    def __init__(self, filtering: bool = True) -> None:
+        """Create the event bus for the first time."""
+        self._handlers = {}
+        self._begin_frame = []
+        self._end_frame = []
+        self._taps = []
+        self._filtering = filtering
+        self._filter_changed = True
+        self._pygame_types = None
+        self._pending = []
+        self.source = None
+        self.clock = time.time
+        self.frame = 0
+        self.time = time.time()
+
+    def subscribe(self, type_: int, handler: Callable[[pygame.event.EventType], None]) -> None:
+        """Call handler with every event of the type."""
+        handlers = self._handlers.setdefault(type_, [])
+        if handler not in handlers:
+            handlers.append(handler)
+            self._filter_changed = self._filter_changed or self._filtering
+
+    def unsubscribe(self, type_: int, handler: Callable[[pygame.event.EventType], None]) -> None:
+        """Stop calling handler with the events of the type."""
+        handlers = self._handlers.get(type_, [])
+        if handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self._handlers[type_]
+            self._filter_changed = self._filter_changed or self._filtering
+
+    def subscribe_frame(self, begin: Optional[Callable[[float], None]] = None,
+                        end: Optional[Callable[[], None]] = None) -> None:
+        """Call begin with the frame time before dispatching the events of every frame, and end after."""
+        if begin is not None and begin not in self._begin_frame:
+            self._begin_frame.append(begin)
+        if end is not None and end not in self._end_frame:
+            self._end_frame.append(end)
+
+    def attach(self, software: object) -> None:
+        """
+        Subscribe a software to the events it manages.
+        ----------------------------------------------
+        The software gives its handlers in a 'handlers' dictionary, keyed on the event types.
+        Its optional 'begin_frame' and 'end_frame' methods are called around the events of every frame.
+        """
+        for (type_, handler) in software.handlers.items():
+            self.subscribe(type_, handler)
+        self.subscribe_frame(getattr(software, 'begin_frame', None), getattr(software, 'end_frame', None))
+
+    def tap(self, tap: Callable[[int, float, List[pygame.event.EventType]], None]) -> None:
+        """Call tap with the frame number, the frame time and every event of the frame, before dispatching them."""
+        if tap not in self._taps:
+            self._taps.append(tap)
+
+    def untap(self, tap: Callable[[int, float, List[pygame.event.EventType]], None]) -> None:
+        """Stop calling tap every frame."""
+        if tap in self._taps:
+            self._taps.remove(tap)
+
+    def detach(self, software: object) -> None:
+        """Unsubscribe a software from the events it manages."""
+        for (type_, handler) in software.handlers.items():
+            self.unsubscribe(type_, handler)
+        for (hooks, name) in ((self._begin_frame, 'begin_frame'), (self._end_frame, 'end_frame')):
+            hook = getattr(software, name, None)
+            if hook in hooks:
+                hooks.remove(hook)
+
+    def reset_filter(self) -> None:
+        """
+        Let only the subscribed event types reach the pygame event queue, or every type without filtering.
+        ---------------------------------------------------------------------------------------------------
+        Only the pygame event types are blocked, the user event types always reach the queue.
+        The display is initialized the first time, the event queue needs it.
+        """
+        if not pygame.display.get_init():
+            pygame.display.init()
+        self._filter_changed = False
+        if self._filtering:
+            if self._pygame_types is None:
+                self._pygame_types = [type_ for type_ in range(pg.NOEVENT + 1, pg.USEREVENT)
+                                      if pygame.event.event_name(type_) != 'Unknown']
+            blocked = [type_ for type_ in self._pygame_types if type_ not in self._handlers]
+            pygame.event.set_blocked(blocked)
+            pygame.event.set_allowed(list(self._handlers))
+        else:
+            pygame.event.set_allowed(None)
+
+    def pump(self) -> List[pygame.event.EventType]:
+        """Pull the pygame events of the frame, dispatch them and return them."""
+        if self._filter_changed:
+            self.reset_filter()
+        self.time = now = self.clock()
+        for hook in self._begin_frame:
+            hook(now)
+        events = pygame.event.get() if self.source is None else self.source.get()
+        if self._pending:
+            events[:0] = self._pending
+            self._pending = []
+        for tap in self._taps:
+            tap(self.frame, now, events)
+        self.frame += 1
+        handlers = self._handlers
+        for event in events:
+            for handler in handlers.get(event.type, ()):
+                handler(event)
+        for hook in self._end_frame:
+            hook()
+        return events
+
+    def wait(self, timeout: int) -> bool:
+        """
+        Sleep until an event arrives, or timeout milliseconds passed.
+        -------------------------------------------------------------
+        The event is kept for the next pump. Return True if an event arrived, False otherwise.
+        The source waits in place of pygame if it has a wait() method.
+        """
+        if self._filter_changed:
+            self.reset_filter()
+        if self.source is not None and hasattr(self.source, 'wait'):
+            return self.source.wait(timeout)
+        event = pygame.event.wait(timeout)
+        if event.type == pg.NOEVENT:
+            return False
+        self._pending.append(event)
+        return True
+
+    @property
+    def filtering(self) -> bool:
+        """Return True if the event types nobody subscribed to are blocked, False otherwise."""
+        return self._filtering
+
+    @filtering.setter
+    def filtering(self, value: bool) -> None:
+        """Turn the event filtering to value."""
+        self._filtering = value
+        self.reset_filter()
+
+    @property
+    def types(self) -> List[int]:
+        """Return the subscribed event types."""
+        return list(self._handlers)
@@ -1,34 +1,61 @@
 # coding: utf-8
 
-from typing import Optional, Tuple, Union
+import weakref
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 import pygame
+import pygame.locals as pg
 
 from tools import decorators
+from tools.assets import AssetManager
 from tools.softwares import Screen
 
 
 class Sprite(object):
-    """Manage sprites. Abstract class."""
-
-    def __init__(self, pos: (int, int) = (0, 0)) -> None:
-        """Create the sprite for the first time."""
+    """
+    Manage sprites. Abstract class.
+    -------------------------------
+    The property setters do not render the image, they mark it stale,
+    it is rendered once the next time it is used, after any number of changes.
+    """
+
+    __slots__ = ('_watchers', '_image', '_stale', '_pos', '_area', '_previous_area', '_dirty', '__weakref__')
+
+    def __init__(self, pos: (int, int) = (0, 0), loaded: bool = True) -> None:
+        """Create the sprite for the first time. Its image is not rendered before it is used if not loaded."""
+        self._watchers = None
         self._image = None
-        self.reset_image()
+        self._stale = False
+        if loaded:
+            self.reset_image()
         self._pos = pos
         self._area = None
         self.reset_area()
+        self._previous_area = None
 
     def __getstate__(self) -> dict:
         """Use to pickle the sprite."""
-        dict_ = self.__dict__.copy()
+        dict_ = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name not in ('__weakref__', '__dict__') and hasattr(self, name):
+                    dict_[name] = getattr(self, name)
+        dict_.update(getattr(self, '__dict__', {}))
         dict_.pop('_image')
+        dict_.pop('_stale')
         dict_.pop('_area')
+        dict_.pop('_previous_area')
+        dict_.pop('_watchers')
         return dict_
 
     def __setstate__(self, dict_: dict) -> None:
         """Use to unpickle the sprite."""
-        self.__dict__ = dict_
+        for (name, value) in dict_.items():
+            setattr(self, name, value)
+        self._previous_area = None
+        self._watchers = None
+        self._stale = False
         self.reset_image()
         self.reset_area()
 
@@ -38,15 +65,108 @@ class Sprite(object):
 
     def reset_area(self) -> None:
         """Reset the sprite area from unpickler."""
-        self._area = self._image.get_rect(topleft=self._pos)
+        size = self._image.get_size() if self._image is not None and not self._stale else self.measure()
+        self._area = pygame.Rect(self._pos, size)
+        self.invalidate()
+
+    def measure(self) -> Exception:
+        """Return the size of the sprite image, without rendering it. Need to be overridden."""
+        raise NotImplementedError()
+
+    def reset_later(self, area: bool = False) -> None:
+        """Mark the sprite image stale, it is rendered the next time it is used. Reset the area now if area is True."""
+        self._stale = True
+        if area:
+            self.reset_area()
+        else:
+            self.invalidate()
+
+    def refresh(self) -> None:
+        """Render the sprite image now if it is stale or not loaded."""
+        if self._stale or self._image is None:
+            self._stale = False
+            self.reset_image()
+
+    def configure(self, **properties: object) -> None:
+        """
+        Modify several properties of the sprite at once.
+        ------------------------------------------------
+        The watchers are told once, after every property is modified, and the image is rendered once, later.
+        Usage:
+        > text.configure(message="HELLO", message_color=(255, 0, 0), font_size=48)
+        """
+        watchers = self._watchers
+        self._watchers = None
+        try:
+            for (name, value) in properties.items():
+                setattr(self, name, value)
+        finally:
+            self._watchers = watchers
+        self.invalidate()
+
+    def load(self) -> None:
+        """Render the sprite image if it is not loaded."""
+        self.refresh()
+
+    def unload(self) -> None:
+        """Free the sprite image, it will be rendered again the next time it is used."""
+        self._image = None
+
+    @property
+    def loaded(self) -> bool:
+        """Return True if the sprite image is rendered, False otherwise."""
+        return self._image is not None
 
-    def blit_on(self, surface: Union[Screen, pygame.Surface]) -> None:
+    @property
+    def stale(self) -> bool:
+        """Return True if the sprite image has to be rendered again before it is used, False otherwise."""
+        return self._stale
+
+    def invalidate(self) -> None:
+        """Force the sprite to be displayed again at the next dirty blit, and tell its watchers it changed."""
+        self._dirty = True
+        if self._watchers:
+            for watcher in self._watchers:
+                watcher(self)
+
+    def watch(self, watcher: Callable[['Sprite'], None]) -> None:
+        """Call watcher with the sprite every time its image or area changes."""
+        if self._watchers is None:
+            self._watchers = []
+        if watcher not in self._watchers:
+            self._watchers.append(watcher)
+
+    def unwatch(self, watcher: Callable[['Sprite'], None]) -> None:
+        """Stop calling watcher when the sprite changes."""
+        if self._watchers is not None and watcher in self._watchers:
+            self._watchers.remove(watcher)
+
+    def dirty_areas(self) -> List[pygame.Rect]:
+        """Return the areas to refresh since the last blit, the old one and the new one."""
+        if not self._dirty:
+            return []
+        if self._previous_area is None or self._previous_area == self._area:
+            return [self._area.copy()]
+        return [self._previous_area, self._area.copy()]
+
+    def blit_on(self, surface: Union[Screen, pygame.Surface]) -> pygame.Rect:
         """Display the sprite on a surface."""
-        surface.blit(self._image, self._area)
+        if self._stale or self._image is None:
+            self.refresh()
+        self._dirty = False
+        self._previous_area = self._area.copy()
+        return surface.blit(self._image, self._area)
+
+    @property
+    def dirty(self) -> bool:
+        """Return True if the sprite has changed since the last blit, False otherwise."""
+        return self._dirty
 
     @property
     def image(self) -> pygame.Surface:
-        """Return the current sprite image."""
+        """Return the current sprite image, rendered again if it is stale."""
+        if self._stale or self._image is None:
+            self.refresh()
         return self._image
 
     @property
@@ -65,6 +185,7 @@ class Sprite(object):
         y = self._pos[1]
         self._pos = (value, y)
         self._area.x = value
+        self.invalidate()
 
     @property
     def y(self) -> int:
@@ -77,6 +198,7 @@ class Sprite(object):
         x = self._pos[0]
         self._pos = (x, value)
         self._area.y = value
+        self.invalidate()
 
     @property
     def pos(self) -> (int, int):
@@ -88,6 +210,7 @@ class Sprite(object):
         """Modify the sprite topleft position."""
         self._pos = value
         self._area.topleft = value
+        self.invalidate()
 
     @property
     def width(self) -> int:
@@ -105,20 +228,208 @@ class Sprite(object):
         return self._area.size
 
 
+@decorators.singleton(parameters=False)
+class SurfacePool(object):
+    """
+    Share the pixel buffers of the resized surfaces, using the singleton decorator.
+    -------------------------------------------------------------------------------
+    The buffers are allocated with power of two sizes, filed under their own pixel format,
+    and used through subsurface views, so a surface can grow and shrink without allocating new pixels.
+    The released buffers are kept while they fit in max_bytes, the least recently released first evicted,
+    and handed out again only once no view on them is left.
+    Only the sizes which fit in an eighth of max_bytes are pooled.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, min_size: int = 16) -> None:
+        """Create the surface pool for the first time."""
+        self._max_bytes = max_bytes
+        self._min_size = min_size
+        self._bytes = 0
+        self._buffers = OrderedDict()
+        self._formats = {}
+        self._views = weakref.WeakKeyDictionary()
+        self.allocations = 0
+        self.reuses = 0
+        self.releases = 0
+        self.evictions = 0
+
+    def bucket(self, size: (int, int)) -> (int, int):
+        """Return the size of the buffers able to hold a size, the next powers of two."""
+        (width, height) = size
+        return (max(self._min_size, 1 << max(0, width - 1).bit_length()),
+                max(self._min_size, 1 << max(0, height - 1).bit_length()))
+
+    def fits(self, size: (int, int)) -> bool:
+        """Return True if the buffers able to hold a size are small enough to be pooled, False otherwise."""
+        (width, height) = self.bucket(size)
+        return 4 * width * height <= self._max_bytes // 8
+
+    def view(self, buffer: pygame.Surface, size: (int, int)) -> pygame.Surface:
+        """Return a view on the topleft of a buffer, the buffer is not handed out again while the view is used."""
+        view = buffer.subsurface((0, 0) + tuple(size))
+        self._views.setdefault(buffer, []).append(weakref.ref(view))
+        return view
+
+    def in_use(self, buffer: pygame.Surface) -> bool:
+        """Return True if a view on a buffer is still used, False otherwise."""
+        views = [view for view in self._views.get(buffer, ()) if view() is not None]
+        if views:
+            self._views[buffer] = views
+        else:
+            self._views.pop(buffer, None)
+        return bool(views)
+
+    @staticmethod
+    def get_format(surface: pygame.Surface) -> tuple:
+        """Return the pixel format of a surface: its depth, its per-pixel alpha and its masks."""
+        return (surface.get_bitsize(), surface.get_flags() & pg.SRCALPHA, surface.get_masks())
+
+    def _new_format(self, flags: int) -> tuple:
+        """Return the pixel format of the new surfaces with flags, it follows the display format."""
+        display = pygame.display.get_surface()
+        key = (flags, self.get_format(display) if display is not None else None)
+        format_ = self._formats.get(key)
+        if format_ is None:
+            format_ = self._formats[key] = self.get_format(pygame.Surface((1, 1), flags))
+        return format_
+
+    def acquire(self, size: (int, int), flags: int = 0) -> pygame.Surface:
+        """Return a buffer able to hold a size, a released and unused one of the same pixel format if there is one."""
+        key = (self.bucket(size), self._new_format(flags))
+        buffers = self._buffers.get(key, ())
+        for (i, buffer) in enumerate(reversed(buffers)):
+            if not self.in_use(buffer):
+                del buffers[len(buffers) - 1 - i]
+                if not buffers:
+                    del self._buffers[key]
+                self._bytes -= buffer.get_pitch() * buffer.get_height()
+                self.reuses += 1
+                return buffer
+        self.allocations += 1
+        return pygame.Surface(key[0], flags)
+
+    def release(self, buffer: pygame.Surface) -> None:
+        """Give back a buffer, it will be returned by acquire() if it fits in the memory budget."""
+        self.releases += 1
+        size = buffer.get_pitch() * buffer.get_height()
+        if size > self._max_bytes:
+            self.evictions += 1
+            return
+        key = (buffer.get_size(), self.get_format(buffer))
+        self._buffers.setdefault(key, []).append(buffer)
+        self._buffers.move_to_end(key)
+        self._bytes += size
+        self.reduce(self._max_bytes)
+
+    def reduce(self, max_bytes: int) -> None:
+        """Evict the least recently released buffers until the pool fits in max_bytes."""
+        while self._bytes > max_bytes and self._buffers:
+            (key, buffers) = next(iter(self._buffers.items()))
+            buffer = buffers.pop(0)
+            if not buffers:
+                del self._buffers[key]
+            self._bytes -= buffer.get_pitch() * buffer.get_height()
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Evict every buffer of the pool."""
+        self.reduce(-1)
+
+    def __len__(self) -> int:
+        """Return the number of buffers in the pool."""
+        return sum([len(buffers) for buffers in self._buffers.values()])
+
+    def stats(self) -> dict:
+        """Return the counters of the pool and the memory it keeps."""
+        return {'buffers': len(self), 'bytes': self._bytes, 'allocations': self.allocations, 'reuses': self.reuses,
+                'releases': self.releases, 'evictions': self.evictions}
+
+    @property
+    def bytes(self) -> int:
+        """Return the current memory kept by the released buffers."""
+        return self._bytes
+
+    @property
+    def max_bytes(self) -> int:
+        """Return the current memory budget of the pool."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        """Modify the memory budget of the pool."""
+        self._max_bytes = value
+        self.reduce(value)
+
+
 class Surface(Sprite):
-    """Manage surfaces."""
+    """
+    Manage surfaces.
+    ----------------
+    The image is allocated with its exact size, until the surface is resized or if pooled is True.
+    Then it is a view on a pooled buffer, kept while the surface is resized inside it,
+    given back to the pool otherwise. The large surfaces are never pooled.
+    """
+
+    __slots__ = ('_size', '_color', '_pooled', '_buffer')
 
     def __init__(self, pos: (int, int) = (0, 0), size: (int, int) = (50, 50),
-                 color: (int, int, int) = (0, 0, 0)) -> None:
+                 color: (int, int, int) = (0, 0, 0), loaded: bool = True, pooled: bool = False) -> None:
         """Create the surface for the first time."""
         self._size = size
         self._color = color
-        super(Surface, self).__init__(pos=pos)
+        self._pooled = pooled
+        self._buffer = None
+        super(Surface, self).__init__(pos=pos, loaded=loaded)
+
+    def __getstate__(self) -> dict:
+        """Use to pickle the sprite."""
+        dict_ = super(Surface, self).__getstate__()
+        dict_.pop('_buffer')
+        return dict_
+
+    def __setstate__(self, dict_: dict) -> None:
+        """Use to unpickle the sprite."""
+        self._image = None
+        self._pooled = False
+        self._buffer = None
+        super(Surface, self).__setstate__(dict_)
 
     def reset_image(self) -> None:
         """Reset the surface image from unpickler. Overriding method."""
-        self._image = pygame.Surface(self._size)
+        pool = SurfacePool()
+        (width, height) = self._size
+        if self._image is not None and self._image.get_size() != self._size:
+            # A RESIZED SURFACE IS ANIMATED, ITS NEXT IMAGES ARE POOLED
+            self._pooled = True
+        self._image = None
+        buffer = self._buffer
+        pooled = self._pooled and pool.fits(self._size)
+        if buffer is not None:
+            (buffer_width, buffer_height) = buffer.get_size()
+            (bucket_width, bucket_height) = pool.bucket(self._size)
+            if (not pooled or width > buffer_width or height > buffer_height
+                    or buffer_width * buffer_height > 4 * bucket_width * bucket_height):
+                pool.release(buffer)
+                buffer = self._buffer = None
+        if not pooled:
+            self._image = pygame.Surface(self._size)
+        else:
+            if buffer is None:
+                buffer = self._buffer = pool.acquire(self._size)
+            self._image = pool.view(buffer, self._size)
         self._image.fill(self._color)
+        self.invalidate()
+
+    def unload(self) -> None:
+        """Free the surface image, its buffer is given back to the pool. Overriding method."""
+        super(Surface, self).unload()
+        if self._buffer is not None:
+            SurfacePool().release(self._buffer)
+            self._buffer = None
+
+    def measure(self) -> (int, int):
+        """Return the size of the surface image, without rendering it. Overriding method."""
+        return self._size
 
     @property
     def width(self) -> int:
@@ -128,10 +439,10 @@ class Surface(Sprite):
     @width.setter
     def width(self, value: int) -> None:
         """Modify the surface width."""
-        height = self._size[0]
+        height = self._size[1]
         self._size = (value, height)
-        self.reset_image()
         self._area.width = value
+        self.reset_later()
 
     @property
     def height(self) -> int:
@@ -143,8 +454,8 @@ class Surface(Sprite):
         """Modify the surface height."""
         width = self._size[0]
         self._size = (width, value)
-        self.reset_image()
         self._area.height = value
+        self.reset_later()
 
     @property
     def size(self) -> (int, int):
@@ -155,8 +466,8 @@ class Surface(Sprite):
     def size(self, value: (int, int)) -> None:
         """Modify the surface size."""
         self._size = value
-        self.reset_image()
         self._area.size = value
+        self.reset_later()
 
     @property
     def color(self) -> (int, int, int):
@@ -167,22 +478,263 @@ class Surface(Sprite):
     def color(self, value: (int, int, int)) -> None:
         """Modify the surface color."""
         self._color = value
-        self._image.fill(value)
+        self.reset_later()
+
+
+class Image(Sprite):
+    """Manage images loaded from files, shared between the images through the asset manager."""
+
+    __slots__ = ('_filename', '_alpha')
+
+    def __init__(self, pos: (int, int) = (0, 0), filename: str = "", alpha: Optional[bool] = None,
+                 loaded: bool = True) -> None:
+        """Create the image for the first time."""
+        self._filename = filename
+        self._alpha = alpha
+        super(Image, self).__init__(pos=pos, loaded=loaded)
+
+    def reset_image(self) -> None:
+        """Reset the image from unpickler. Overriding method."""
+        self._image = AssetManager().acquire(self._filename, self, self._alpha)
+        self.invalidate()
+
+    def measure(self) -> (int, int):
+        """Return the size of the image, without keeping it loaded. Overriding method."""
+        return AssetManager().load(self._filename, self._alpha).get_size()
+
+    def unload(self) -> None:
+        """Free the image, the asset may be evicted if no other image uses it. Overriding method."""
+        if self._image is not None:
+            AssetManager().release(self._filename, self, self._alpha)
+        super(Image, self).unload()
+
+    @property
+    def filename(self) -> str:
+        """Return the current image file."""
+        return self._filename
+
+    @filename.setter
+    def filename(self, value: str) -> None:
+        """Modify the image file."""
+        self.unload()
+        self._filename = value
+        self.reset_later(area=True)
+
+    @property
+    def alpha(self) -> Optional[bool]:
+        """Return True if the image keeps its per-pixel alpha, False if it loses it, None if it depends on the file."""
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value: Optional[bool]) -> None:
+        """Modify the image per-pixel alpha."""
+        self.unload()
+        self._alpha = value
+        self.reset_later()
+
+
+class SpatialGrid(object):
+    """Index sprite areas in a uniform grid of cells, to find the sprites under a point without testing them all."""
+
+    def __init__(self, cell_size: int = 64) -> None:
+        """Create the spatial grid for the first time."""
+        self._cell_size = cell_size
+        self._cells = {}
+        self._ranges = {}
+        self._orders = {}
+        self._order = 0
+
+    def _range(self, area: pygame.Rect) -> (int, int, int, int):
+        """Return the first and last cells covered by an area, its right and bottom borders included."""
+        size = self._cell_size
+        return (area.left // size, area.top // size, area.right // size, area.bottom // size)
+
+    def add(self, sprite: Sprite) -> None:
+        """Index a sprite, it will be found above the sprites added before it."""
+        if sprite not in self._ranges:
+            self._ranges[sprite] = None
+            self._orders[sprite] = self._order
+            self._order += 1
+            sprite.watch(self.update)
+            self.update(sprite)
+
+    def remove(self, sprite: Sprite) -> None:
+        """Stop indexing a sprite."""
+        if sprite in self._ranges:
+            sprite.unwatch(self.update)
+            self._move(sprite, self._ranges.pop(sprite), None)
+            del self._orders[sprite]
+
+    def clear(self) -> None:
+        """Stop indexing every sprite."""
+        for sprite in self._ranges:
+            sprite.unwatch(self.update)
+        self._cells = {}
+        self._ranges = {}
+        self._orders = {}
+
+    def update(self, sprite: Sprite) -> None:
+        """Move a sprite to the cells covered by its current area. Called by the sprite when it changes."""
+        range_ = self._range(sprite.area)
+        previous_range = self._ranges[sprite]
+        if range_ != previous_range:
+            self._ranges[sprite] = range_
+            self._move(sprite, previous_range, range_)
+
+    def _move(self, sprite: Sprite, previous_range: Optional[tuple], range_: Optional[tuple]) -> None:
+        """Move a sprite from the cells of a range to the cells of another range."""
+        if previous_range is not None:
+            (left, top, right, bottom) = previous_range
+            for i in range(left, right + 1):
+                for j in range(top, bottom + 1):
+                    cell = self._cells[(i, j)]
+                    cell.remove(sprite)
+                    if not cell:
+                        del self._cells[(i, j)]
+        if range_ is not None:
+            (left, top, right, bottom) = range_
+            for i in range(left, right + 1):
+                for j in range(top, bottom + 1):
+                    self._cells.setdefault((i, j), []).append(sprite)
+
+    def all_at(self, pos: (int, int)) -> List[Sprite]:
+        """Return the sprites whose area contains a position, borders included, from the bottom to the top one."""
+        (x, y) = pos
+        size = self._cell_size
+        sprites = [sprite for sprite in self._cells.get((x // size, y // size), ())
+                   if sprite.area.left <= x <= sprite.area.right and sprite.area.top <= y <= sprite.area.bottom]
+        sprites.sort(key=self._orders.__getitem__)
+        return sprites
+
+    def at(self, pos: (int, int)) -> Optional[Sprite]:
+        """Return the top sprite whose area contains a position, borders included, None if there is none."""
+        (x, y) = pos
+        size = self._cell_size
+        top_sprite = None
+        for sprite in self._cells.get((x // size, y // size), ()):
+            area = sprite.area
+            if area.left <= x <= area.right and area.top <= y <= area.bottom:
+                if top_sprite is None or self._orders[sprite] > self._orders[top_sprite]:
+                    top_sprite = sprite
+        return top_sprite
+
+    def __len__(self) -> int:
+        """Return the number of indexed sprites."""
+        return len(self._ranges)
+
+    def __contains__(self, sprite: Sprite) -> bool:
+        """Know if a sprite is indexed."""
+        return sprite in self._ranges
+
+    def __iter__(self) -> Iterator[Sprite]:
+        """Iterate over the indexed sprites."""
+        return iter(self._ranges)
+
+    @property
+    def cell_size(self) -> int:
+        """Return the size of the grid cells."""
+        return self._cell_size
 
 
-@decorators.singleton(parameters=True)
+@decorators.singleton(parameters=True, weak=True)
 class Font(pygame.font.Font):
-    """Overriding the pygame Font class to apply the singleton decorator."""
-    pass
+    """Overriding the pygame Font class to apply the singleton decorator, fonts nobody uses are freed."""
+
+    def __init__(self, filename: Optional[str] = None, size: int = 20) -> None:
+        """Create the font for the first time, the font module is initialized the first time it is used."""
+        if not pygame.font.get_init():
+            pygame.font.init()
+        pygame.font.Font.__init__(self, filename, size)
+
+
+@decorators.singleton(parameters=False)
+class RenderCache(object):
+    """Share the rendered text images between texts, using the singleton decorator."""
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024) -> None:
+        """Create the render cache for the first time."""
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font: pygame.font.Font, message: str, antialias: bool, color: (int, int, int),
+               background: Optional[Tuple[int, int, int]] = None) -> pygame.Surface:
+        """
+        Render a message with a font, or return the image rendered with the same arguments before.
+        -------------------------------------------------------------------------------------------
+        The returned image is shared between every caller and must not be modified.
+        """
+        key = (font, message, antialias, tuple(color), tuple(background) if background is not None else None)
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = font.render(message, antialias, color, background)
+        self._store(key, image)
+        return image
+
+    def store(self, font: pygame.font.Font, message: str, antialias: bool, color: (int, int, int),
+              background: Optional[Tuple[int, int, int]], image: pygame.Surface) -> None:
+        """Add an image rendered elsewhere, it will be returned by render() called with the same arguments."""
+        key = (font, message, antialias, tuple(color), tuple(background) if background is not None else None)
+        if key not in self._images:
+            self._store(key, image)
+
+    def _store(self, key: tuple, image: pygame.Surface) -> None:
+        """Keep an image if it fits in the memory budget."""
+        size = image.get_pitch() * image.get_height()
+        if size <= self._max_bytes:
+            self._images[key] = image
+            self._bytes += size
+            self.reduce(self._max_bytes)
+
+    def reduce(self, max_bytes: int) -> None:
+        """Evict the least recently used images until the cache fits in max_bytes."""
+        while self._bytes > max_bytes and self._images:
+            (_, image) = self._images.popitem(last=False)
+            self._bytes -= image.get_pitch() * image.get_height()
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Evict every image of the cache."""
+        self.reduce(0)
+
+    def __len__(self) -> int:
+        """Return the number of images in the cache."""
+        return len(self._images)
+
+    @property
+    def bytes(self) -> int:
+        """Return the current memory used by the images of the cache."""
+        return self._bytes
+
+    @property
+    def max_bytes(self) -> int:
+        """Return the current memory budget of the cache."""
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        """Modify the memory budget of the cache."""
+        self._max_bytes = value
+        self.reduce(value)
 
 
 class Text(Sprite):
     """Manage texts."""
 
+    __slots__ = ('_font_filename', '_font_size', '_font', '_antialias', '_message', '_message_color',
+                 '_background_color')
+
     def __init__(self, pos: (int, int) = (0, 0), antialias: bool = True,
                  font_filename: Optional[str] = None, font_size: int = 84,
                  message: str = "PYGAME", message_color: (int, int, int) = (0, 0, 0),
-                 background_color: Optional[Tuple[int, int, int]] = None) -> None:
+                 background_color: Optional[Tuple[int, int, int]] = None, loaded: bool = True) -> None:
         """Create the text for the first time."""
         self._font_filename = font_filename
         self._font_size = font_size
@@ -192,7 +744,7 @@ class Text(Sprite):
         self._message = message
         self._message_color = message_color
         self._background_color = background_color
-        super(Text, self).__init__(pos=pos)
+        super(Text, self).__init__(pos=pos, loaded=loaded)
 
     def __getstate__(self) -> dict:
         """Use to pickle the sprite."""
@@ -202,9 +754,10 @@ class Text(Sprite):
 
     def __setstate__(self, dict_: dict) -> None:
         """Use to unpickle the sprite."""
-        self.__dict__ = dict_
+        self._font_filename = dict_['_font_filename']
+        self._font_size = dict_['_font_size']
         self.reset_font()
-        super(Text, self).__setstate__(self.__dict__)
+        super(Text, self).__setstate__(dict_)
 
     def reset_font(self) -> None:
         """Reset the text font."""
@@ -212,7 +765,13 @@ class Text(Sprite):
 
     def reset_image(self) -> None:
         """Reset the text image from unpickler."""
-        self._image = self._font.render(self._message, self._antialias, self._message_color, self._background_color)
+        self._image = RenderCache().render(self._font, self._message, self._antialias, self._message_color,
+                                           self._background_color)
+        self.invalidate()
+
+    def measure(self) -> (int, int):
+        """Return the size of the text image, without rendering it. Overriding method."""
+        return self._font.size(self._message)
 
     @property
     def font_filename(self) -> str:
@@ -224,8 +783,7 @@ class Text(Sprite):
         """Modify the text font."""
         self._font_filename = value
         self.reset_font()
-        self.reset_image()
-        self.reset_area()
+        self.reset_later(area=True)
 
     @property
     def font_size(self) -> int:
@@ -237,8 +795,7 @@ class Text(Sprite):
         """Modify the text font size."""
         self._font_size = value
         self.reset_font()
-        self.reset_image()
-        self.reset_area()
+        self.reset_later(area=True)
 
     @property
     def message(self) -> str:
@@ -249,8 +806,7 @@ class Text(Sprite):
     def message(self, value: str) -> None:
         """Modify the text message."""
         self._message = value
-        self.reset_image()
-        self.reset_area()
+        self.reset_later(area=True)
 
     @property
     def antialias(self) -> bool:
@@ -261,7 +817,7 @@ class Text(Sprite):
     def antialias(self, value: bool) -> None:
         """Modify the text antialias."""
         self._antialias = value
-        self.reset_image()
+        self.reset_later()
 
     @property
     def message_color(self) -> (int, int, int):
@@ -272,7 +828,7 @@ class Text(Sprite):
     def message_color(self, value: (int, int, int)) -> None:
         """Modify the text color."""
         self._message_color = value
-        self.reset_image()
+        self.reset_later()
 
     @property
     def background_color(self) -> Optional[Tuple[int, int, int]]:
@@ -283,4 +839,4 @@ class Text(Sprite):
     def background_color(self, value: Optional[Tuple[int, int, int]]) -> None:
         """Modify the text background color."""
         self._background_color = value
-        self.reset_image()
+        self.reset_later()